@@ -12,7 +12,6 @@ from modules.analysis import add_sma, add_technical_indicators, get_sma_analysis
 from modules.view import get_candlestick_chart
 from modules.prediction import get_future_price_prediction # 수정된 예측 함수
 from modules.analysis import add_sma, add_technical_indicators, get_sma_analysis
-from modules.analysis import normalize_columns
 
 # 페이지 설정
 st.set_page_config(page_title="Coin Detail", page_icon="📈", layout="wide")
@@ -37,7 +36,7 @@ days_to_predict = st.sidebar.slider("미래 예측 기간 (일)", 1, 7, 3)
 # --- 2. 데이터 가져오기 및 분석 ---
 
 data_load_state = st.info(f"{selected_name} ({selected_period}) 데이터를 불러오는 중...")
-# crypto.py의 get_crypto_history는 이미 캐싱되어 있습니다.
+# crypto.py의 get_crypto_history는 이미 캐싱되어 있으며, 표준 OHLCV 형태로 반환합니다.
 price_data = get_crypto_history(selected_symbol, period=selected_period, interval="1d")
 data_load_state.empty()
 
@@ -46,24 +45,8 @@ data_load_state.empty()
 if price_data is None:
     st.error("데이터를 불러오는 데 실패했습니다. 심볼 또는 기간을 확인해주세요.")
 else:
-    # 🌟🌟🌟 최종 수정: MultiIndex 문제 해결 및 컬럼 정규화 🌟🌟🌟
-    
-    # 1. MultiIndex 컬럼을 평탄화
-    if isinstance(price_data.columns, pd.MultiIndex):
-        # MultiIndex인 경우: 튜플을 문자열로 변환
-        price_data.columns = ['_'.join(str(c) for c in col).strip('_') if isinstance(col, tuple) else str(col) for col in price_data.columns]
-    
-    # 2. normalize_columns 함수를 사용하여 컬럼 이름 표준화
-    price_data = normalize_columns(price_data)
-    
-    # 3. 필수 컬럼 확인
-    required_cols = ['Close', 'Volume', 'Open', 'High', 'Low']
-    missing_cols = [col for col in required_cols if col not in price_data.columns]
-    
-    if missing_cols:
-        st.error(f"데이터에 필수 컬럼이 없습니다: {missing_cols}")
-        st.write("현재 컬럼:", list(price_data.columns))
-        st.stop()
+    # get_crypto_history가 표준 OHLCV 형태(Open/High/Low/Close/Volume, 정렬된 DatetimeIndex)로
+    # 변환·검증된 데이터를 돌려주므로 여기서는 컬럼을 다시 정리하지 않습니다.
     
     # 2-1. 기술적 지표 추가
     processed_data = price_data.copy()
@@ -116,19 +99,20 @@ else:
     # --- 3. 시세 예측 (캐싱 적용) ---
     
     @st.cache_data(ttl=3600) # 1시간(3600초) 동안 예측 결과를 캐시하여 속도를 개선합니다.
-    def cached_prediction(data_hash, days):
+    def cached_prediction(data_hash, days, symbol):
         """
         Streamlit 캐시를 적용하기 위한 래퍼 함수입니다.
         데이터프레임 자체가 아닌, 데이터의 해시값을 인자로 사용합니다.
         """
         # 해시 대신 실제 데이터프레임을 get_future_price_prediction 함수에 전달
-        return get_future_price_prediction(data_hash, days)
+        # 심볼별로 모델과 스케일러를 따로 저장/사용합니다.
+        return get_future_price_prediction(data_hash, days, symbol=symbol)
 
     st.subheader(f"🔮 {days_to_predict}일 미래 시세 예측")
     
     with st.spinner("LSTM 모델로 시세 예측 중... (첫 실행 시 모델 학습으로 인해 시간이 걸릴 수 있습니다.)"):
         # final_features_data를 직접 캐시에 전달
-        prediction_status, predicted_prices = cached_prediction(final_features_data, days_to_predict)
+        prediction_status, predicted_prices = cached_prediction(final_features_data, days_to_predict, selected_symbol)
 
     st.success(prediction_status)
     
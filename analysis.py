@@ -142,44 +142,23 @@ def add_technical_indicators(data, rsi_period=14, fast_period=12, slow_period=26
 
 
 def merge_sentiment_data(price_data, sentiment_data):
+    """
+    날짜별 감성 점수를 가격 데이터에 'Sentiment_Score' 컬럼으로 붙입니다.
+    price_data는 crypto.get_crypto_history가 반환한 표준 형태(DatetimeIndex)를 가정하며, 인덱스는 그대로 유지합니다.
+    """
+    price_data = price_data.copy()
     if sentiment_data is None or sentiment_data.empty:
-        price_data = price_data.copy()
         price_data['Sentiment_Score'] = 0.0
         return price_data
 
-    # 1. 가격 데이터 처리
-    price_data_reset = price_data.reset_index().copy()
-
-    # MultiIndex 컬럼 평탄화
-    if isinstance(price_data_reset.columns, pd.MultiIndex):
-        price_data_reset.columns = [
-            "_".join([str(c) for c in col if c]) for col in price_data_reset.columns
-        ]
-
-    # 첫 번째 컬럼을 날짜 컬럼으로 설정
-    date_col = price_data_reset.columns[0]
-    price_data_reset.rename(columns={date_col: 'ds'}, inplace=True)
-    price_data_reset['ds'] = pd.to_datetime(price_data_reset['ds']).dt.normalize()
-
-    # 2. 감성 데이터 처리
-    sentiment_data = sentiment_data.copy()
-    sentiment_data.rename(columns={'Date': 'ds'}, inplace=True)
-    sentiment_data['ds'] = pd.to_datetime(sentiment_data['ds']).dt.normalize()
-
-    # 3. 병합
-    merged_data = pd.merge(
-        price_data_reset,
-        sentiment_data[['ds', 'Sentiment_Score']],
-        on='ds',
-        how='left'
-    )
-
-    # 4. NaN 값 보정
-    merged_data['Sentiment_Score'] = merged_data['Sentiment_Score'].fillna(0.0)
+    # 1. 감성 데이터를 날짜(자정 기준) -> 점수 형태로 정리
+    sentiment_dates = pd.to_datetime(sentiment_data['Date']).dt.normalize()
+    daily_score = pd.Series(sentiment_data['Sentiment_Score'].values, index=sentiment_dates)
+    daily_score = daily_score[~daily_score.index.duplicated(keep='last')]
 
-    # 5. 인덱스 재설정
-    merged_data = merged_data.set_index('ds')
-    return merged_data.rename_axis('Date')
+    # 2. 가격 데이터의 날짜에 맞춰 병합하고, 감성 데이터가 없는 날은 0.0으로 보정
+    price_data['Sentiment_Score'] = daily_score.reindex(price_data.index.normalize()).fillna(0.0).values
+    return price_data.rename_axis('Date')
 
 
 # modules/analysis.py 파일에 추가
@@ -258,35 +237,3 @@ def get_signal_summary(data):
         final_signal = "➖ 중립 / 관망"
         
     return final_signal, signals
-
-# modules/analysis.py
-
-def normalize_columns(df):
-    """
-    데이터프레임의 컬럼 이름을 표준화합니다.
-    MultiIndex나 ticker가 포함된 컬럼명도 처리합니다.
-    """
-    new_cols = []
-    for col in df.columns:
-        col_str = str(col).strip().lower()
-        
-        # '_' 로 split해서 첫 번째 부분만 사용 (예: 'close_btc-usd' -> 'close')
-        col_base = col_str.split('_')[0]
-        
-        # 표준 컬럼명으로 매핑
-        if col_base in ['adj close', 'adjclose', 'close', 'adj_close']:
-            new_cols.append('Close')
-        elif col_base == 'open':
-            new_cols.append('Open')
-        elif col_base == 'high':
-            new_cols.append('High')
-        elif col_base == 'low':
-            new_cols.append('Low')
-        elif col_base == 'volume':
-            new_cols.append('Volume')
-        else:
-            # 표준 컬럼이 아닌 경우 첫 글자만 대문자로
-            new_cols.append(col_str.capitalize())
-
-    df.columns = new_cols
-    return df
@@ -1,10 +1,10 @@
 import streamlit as st
 import pandas as pd
 import requests
-import plotly.graph_objects as go
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 # 🌟 modules.crypto에서 모든 필수 항목과 COIN_LIST를 임포트합니다.
-from modules.crypto import get_crypto_price, get_crypto_history, COIN_LIST 
+from modules.crypto import get_crypto_prices, get_sparkline_series, COIN_LIST 
+from modules.view import render_sparkline_svg, render_sparkline_grid
 
 st.set_page_config(page_title="Crypto Predictor", page_icon="📈", layout="wide")
 st.title("📈 가상화폐 뉴스 & 시세 분석 대시보드")
@@ -32,70 +32,37 @@ def get_news():
     except Exception as e:
         return []
 
-# --- 미니 차트 생성 함수 ---
-def create_mini_chart(df, coin_name):
-    """지정된 기간의 종가 미니 차트를 생성합니다."""
-    if df is None or df.empty:
-        return go.Figure()
-    
-    # 🌟 컬럼 이름 표준화 (MultiIndex 및 대소문자 문제 해결)
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = ['_'.join(str(c) for c in col).strip('_') if isinstance(col, tuple) else str(col) for col in df.columns]
-        
-    col_mapping = {}
-    for col in df.columns:
-        col_lower = str(col).lower()
-        if 'close' in col_lower:
-            col_mapping[col] = 'Close'
-    
-    df = df.rename(columns=col_mapping)
-
-    # 종가 데이터만 사용
-    if 'Close' not in df.columns:
-        return go.Figure()
-        
-    fig = go.Figure(data=[
-        go.Scatter(x=df.index, y=df['Close'], mode='lines', 
-                   line=dict(color='lightgreen', width=2))
-    ])
-    
-    fig.update_layout(
-        title=f"7일 추이",
-        xaxis_visible=False,
-        yaxis_visible=False,
-        showlegend=False,
-        height=100,
-        margin=dict(l=0, r=0, t=20, b=0),
-        template="plotly_dark",
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-    )
-    return fig
+# --- 스파크라인 (데이터 갱신 시 한 번만 계산·렌더링) ---
+@st.cache_data(ttl=300)
+def get_sparkline_svgs(symbols):
+    """코인별 다운샘플된 7일 종가로 SVG 스파크라인을 만들어 캐시합니다. {심볼: (svg, 7일 수익률 %)}"""
+    return {
+        symbol: (render_sparkline_svg(points), change)
+        for symbol, (points, change) in get_sparkline_series(symbols, period="7d").items()
+    }
 
 # --- 화면 구성 ---
 
 st.subheader("💰 주요 가상화폐 시세 및 추이")
-# COIN_LIST의 길이에 맞춰 컬럼 생성
-coin_cols = st.columns(len(COIN_LIST)) 
 
 with st.spinner("시세 및 추이 정보를 가져오는 중..."):
-    # COIN_LIST의 항목들을 순회하며 가격과 차트를 표시
-    for idx, (name, data) in enumerate(COIN_LIST.items()):
-        price = get_crypto_price(data["coingecko"])
-        history = get_crypto_history(data["yfinance"], period="7d") 
-        
-        with coin_cols[idx]:
-            st.metric(name, 
-                      f"${price:,.2f}" if price else "데이터 없음",
-                      delta_color="normal")
-            
-            if history is not None and not history.empty:
-                # 고유 키를 사용하여 Chart ID 중복 오류를 방지합니다.
-                st.plotly_chart(create_mini_chart(history, name), 
-                               use_container_width=True, 
-                               key=f"mini_chart_{data['yfinance']}") 
-            else:
-                st.caption("차트 데이터 없음")
+    # 가격과 차트 데이터를 코인 수와 무관하게 각각 한 번의 요청으로 가져옵니다.
+    prices = get_crypto_prices(tuple(data["coingecko"] for data in COIN_LIST.values()))
+    sparklines = get_sparkline_svgs(tuple(data["yfinance"] for data in COIN_LIST.values()))
+
+cards = []
+for name, data in COIN_LIST.items():
+    price = prices.get(data["coingecko"])
+    svg, change = sparklines.get(data["yfinance"], ("", None))
+    cards.append({
+        "name": name,
+        "price": f"${price:,.2f}" if price else "데이터 없음",
+        "change": change,
+        "svg": svg,
+    })
+
+# 모든 코인을 하나의 HTML로 한 번에 렌더링합니다.
+st.markdown(render_sparkline_grid(cards), unsafe_allow_html=True)
 
 
 st.markdown("---")
@@ -49,5 +49,164 @@ def run_sma_backtest(data, short_window=5, long_window=20, initial_capital=10000
     return {
         'strategy_profit': strategy_profit,
         'benchmark_profit': benchmark_profit,
-        'cumulative_values': df[['Cumulative_Strategy_Value', 'Cumulative_Benchmark_Value']]
+        'cumulative_values': df[['Cumulative_Strategy_Value', 'Cumulative_Benchmark_Value']],
+        # 일일 수익률 (리스크 분석용. 첫 행은 이전 가격이 없어 NaN)
+        'daily_returns': df[['Strategy_Returns', 'Returns']]
     }
+
+
+# --- 2. 멀티 코인 포트폴리오 백테스트 ---
+# 모든 계산은 (시간 × 코인) 행렬 연산으로 처리하며, 봉 단위 파이썬 루프를 사용하지 않습니다.
+
+def sma_signal_matrix(prices, short_window=5, long_window=20):
+    """단기 SMA가 장기 SMA보다 높은 정도(단기/장기 - 1)를 신호 강도로 반환합니다. 하락 추세는 0입니다."""
+    short_sma = prices.rolling(window=short_window).mean()
+    long_sma = prices.rolling(window=long_window).mean()
+    return (short_sma / long_sma - 1).clip(lower=0)
+
+def momentum_signal_matrix(prices, lookback=20):
+    """lookback 기간 수익률이 양수인 코인만 수익률 크기를 신호 강도로 반환합니다."""
+    return (prices / prices.shift(lookback) - 1).clip(lower=0)
+
+def hold_signal_matrix(prices):
+    """가격이 있는 모든 코인을 보유하는 벤치마크 신호입니다."""
+    return prices.notna().astype(float)
+
+# 전략 이름 -> 신호 행렬 함수
+PORTFOLIO_STRATEGIES = {
+    'sma': sma_signal_matrix,
+    'momentum': momentum_signal_matrix,
+    'hold': hold_signal_matrix,
+}
+
+def compute_target_weights(signals, weighting='equal'):
+    """
+    신호 행렬을 목표 비중 행렬로 변환합니다. 행(시점)별 비중 합은 1 이하이며, 나머지는 현금입니다.
+    - 'equal': 신호가 양수인 코인에 동일 비중
+    - 'signal': 신호 강도에 비례한 비중
+    """
+    strength = np.nan_to_num(np.asarray(signals, dtype=float), nan=0.0)
+    strength[strength < 0] = 0
+
+    if weighting == 'equal':
+        raw = (strength > 0).astype(float)
+    elif weighting == 'signal':
+        raw = strength
+    else:
+        raise ValueError(f"지원하지 않는 비중 방식입니다: {weighting}")
+
+    total = raw.sum(axis=1, keepdims=True)
+    return np.divide(raw, total, out=np.zeros_like(raw), where=total > 0)
+
+def _apply_turnover_limit(targets, growth, max_turnover):
+    """
+    리밸런싱 1회당 회전율이 max_turnover를 넘지 않도록 목표 비중 쪽으로 일부만 이동합니다.
+    직전 실행 비중에 의존하므로 리밸런싱 시점 단위로만 순회합니다. (봉 단위 루프 아님)
+    """
+    executed = np.zeros_like(targets)
+    current = np.zeros(targets.shape[1])  # 시작 시점은 전액 현금
+    for b in range(len(targets)):
+        trade = targets[b] - current
+        turnover = np.abs(trade).sum()
+        if turnover > max_turnover:
+            trade *= max_turnover / turnover
+        executed[b] = current + trade
+
+        # 다음 리밸런싱 직전까지 가격 변동으로 흘러간(drift) 비중
+        value = executed[b] * growth[b]
+        current = value / (1 - executed[b].sum() + value.sum())
+    return executed
+
+def run_portfolio_backtest(prices, strategy='sma', weighting='equal', rebalance_every=7, fee_rate=0.001,
+                           max_turnover=None, initial_capital=10000, periods_per_year=365, signals=None):
+    """
+    여러 코인의 종가 행렬(index: 시간, columns: 코인)로 주기적 리밸런싱 포트폴리오를 백테스트합니다.
+
+    rebalance_every개 봉마다 그 시점 종가까지의 신호로 목표 비중을 정하고 다음 봉부터 보유합니다.
+    리밸런싱 사이에는 가격 변동에 따라 비중이 자연스럽게 변하며, 거래 시 회전율 × fee_rate만큼 수수료를 차감합니다.
+    signals를 직접 넘기면 strategy 대신 해당 신호 행렬을 사용합니다.
+    """
+    prices = prices.sort_index().ffill()
+    n_bars = len(prices)
+    if n_bars < 2 or rebalance_every < 1:
+        return {'error': "데이터가 너무 짧아 백테스팅을 실행할 수 없습니다."}
+
+    if signals is None:
+        signals = PORTFOLIO_STRATEGIES[strategy](prices)
+    signals = signals.reindex(index=prices.index, columns=prices.columns)
+
+    # 1. 누적 로그 수익률: 임의 구간의 가격 변화율 = exp(L[t] - L[s])
+    returns = np.nan_to_num(prices.pct_change().values, nan=0.0)
+    log_growth = np.cumsum(np.log1p(returns), axis=0)
+
+    # 2. 리밸런싱 시점과 각 봉이 속한 리밸런싱 구간
+    rebalance_idx = np.arange(0, n_bars - 1, rebalance_every)
+    block_end_idx = np.minimum(rebalance_idx + rebalance_every, n_bars - 1)
+    block_of_bar = np.maximum(np.arange(n_bars) - 1, 0) // rebalance_every
+
+    # 구간 시작부터 구간 끝까지의 코인별 가격 변화율
+    growth = np.exp(log_growth[block_end_idx] - log_growth[rebalance_idx])
+
+    # 3. 목표 비중 및 실제 실행 비중
+    targets = compute_target_weights(signals.values[rebalance_idx], weighting)
+    if max_turnover is None:
+        weights = targets
+    else:
+        weights = _apply_turnover_limit(targets, growth, max_turnover)
+
+    # 4. 구간 내 포트폴리오 가치 변화 (구간 시작 = 1)
+    cash = 1 - weights.sum(axis=1)
+    bar_growth = np.exp(log_growth - log_growth[rebalance_idx[block_of_bar]])
+    relative_value = cash[block_of_bar] + (weights[block_of_bar] * bar_growth).sum(axis=1)
+
+    # 5. 리밸런싱 직전 비중(drift)과 회전율, 수수료
+    end_value = weights * growth
+    end_total = (cash + end_value.sum(axis=1))[:, np.newaxis]
+    drifted = np.vstack([np.zeros((1, weights.shape[1])), (end_value / end_total)[:-1]])
+    turnover = np.abs(weights - drifted).sum(axis=1)
+    fee_factor = 1 - fee_rate * turnover
+
+    # 6. 자산 가치: 이전 구간들의 누적 성과 × 수수료 × 현재 구간 내 성과
+    block_start_value = np.cumprod(np.concatenate([[1.0], end_total[:-1, 0]])) * np.cumprod(fee_factor)
+    portfolio_value = initial_capital * block_start_value[block_of_bar] * relative_value
+    # 리밸런싱 봉의 종가 시점 가치에는 그 시점에 낸 수수료까지 반영합니다.
+    portfolio_value[rebalance_idx[1:]] *= fee_factor[1:]
+
+    # 7. 성과 지표
+    equity = pd.Series(portfolio_value, index=prices.index, name='Portfolio_Value')
+    period_returns = equity.pct_change().dropna()
+    volatility = period_returns.std()
+    sharpe = period_returns.mean() / volatility * np.sqrt(periods_per_year) if volatility > 0 else 0.0
+    drawdown = equity / equity.cummax() - 1
+    years = (n_bars - 1) / periods_per_year
+
+    return {
+        'total_return': (equity.iloc[-1] / initial_capital - 1) * 100,
+        'sharpe': sharpe,
+        'max_drawdown': drawdown.min() * 100,
+        'turnover': turnover.mean(),
+        'annual_turnover': turnover.sum() / years if years > 0 else turnover.sum(),
+        'cumulative_values': equity.to_frame(),
+        'weights': pd.DataFrame(weights, index=prices.index[rebalance_idx], columns=prices.columns),
+    }
+
+def compare_portfolio_strategies(prices, strategies=None, weightings=('equal', 'signal'), **kwargs):
+    """여러 전략 × 비중 방식 조합의 성과(수익률, 샤프, MDD, 회전율)를 한 표로 반환합니다."""
+    strategies = strategies or list(PORTFOLIO_STRATEGIES)
+    rows = []
+    for strategy in strategies:
+        # 신호는 비중 방식과 무관하므로 전략당 한 번만 계산합니다.
+        signals = PORTFOLIO_STRATEGIES[strategy](prices.sort_index().ffill())
+        for weighting in weightings:
+            result = run_portfolio_backtest(prices, strategy, weighting, signals=signals, **kwargs)
+            if 'error' in result:
+                continue
+            rows.append({
+                'strategy': strategy,
+                'weighting': weighting,
+                'total_return': result['total_return'],
+                'sharpe': result['sharpe'],
+                'max_drawdown': result['max_drawdown'],
+                'turnover': result['turnover'],
+            })
+    return pd.DataFrame(rows)
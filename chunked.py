@@ -0,0 +1,381 @@
+"""
+대용량(여러 해 분봉 등) OHLCV 데이터를 메모리에 한꺼번에 올리지 않고 청크 단위로 처리합니다.
+
+디렉터리 하나가 하나의 저장소이며, 모두 np.load(mmap_mode)로 열 수 있는 .npy 파일입니다.
+    ohlcv.npy        (행, 5)  Open/High/Low/Close/Volume
+    index.npy        (행,)    시각 (datetime64[ns])
+    indicators.npy   (행, 지표 수)  컬럼 순서는 indicator_columns.json
+    X.npy, Y.npy     학습 윈도우 (prediction.create_dataset과 같은 형태)
+
+지표는 청크마다 워밍업 구간(rolling 지표용)을 앞에 겹쳐 계산하고, EMA/OBV처럼 재귀적인 지표는
+이전 청크의 마지막 상태를 이어받아 계산하므로 전체 데이터를 한 번에 계산한 결과와 같습니다.
+재귀 지표(RSI/MACD/ATR/OBV)와 Y는 비트 단위까지 같습니다. rolling 지표(SMA/BB/Stochastic/CCI)와
+이를 포함하는 학습 윈도우 X는 pandas rolling 합계의 반올림 차이가 있고, 그 크기는 가격 수준과
+청크 크기에 따라 달라집니다. 허용 기준(VERIFY_TOLERANCE)은 verify_against_in_memory로 확인합니다.
+    python -m modules.chunked verify --rows 20000 --chunk-size 777
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+from numpy.lib.stride_tricks import sliding_window_view
+
+from modules.analysis import add_sma, add_technical_indicators
+from modules.common import OHLCV_COLUMNS
+
+OHLCV_FILE = 'ohlcv.npy'
+INDEX_FILE = 'index.npy'
+INDICATORS_FILE = 'indicators.npy'
+INDICATOR_COLUMNS_FILE = 'indicator_columns.json'
+X_FILE = 'X.npy'
+Y_FILE = 'Y.npy'
+
+# 지표 계산 청크 크기(행)와 학습 윈도우 생성 청크 크기(윈도우 수)
+DEFAULT_CHUNK_SIZE = 500_000
+DEFAULT_WINDOW_CHUNK_SIZE = 20_000
+
+# 이전 청크의 값으로 이어서 계산하는 재귀 지표
+_RECURSIVE_COLUMNS = ['RSI', 'MACD', 'MACD_Signal', 'MACD_Hist', 'ATR', 'OBV']
+
+# 인메모리 계산과 비교할 때 허용하는 오차 (항목별 최대 오차 / 인메모리 값의 최대 절댓값)
+VERIFY_TOLERANCE = 1e-8
+
+
+def _iter_chunks(n_rows, chunk_size):
+    for start in range(0, n_rows, chunk_size):
+        yield start, min(start + chunk_size, n_rows)
+
+
+# --- 1. 저장소 ---
+
+def save_ohlcv_store(data, directory):
+    """표준 OHLCV 데이터프레임(crypto.normalize_ohlcv 결과)을 메모리 맵 저장소로 저장합니다."""
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, OHLCV_FILE), data[OHLCV_COLUMNS].to_numpy(dtype='float64'))
+    np.save(os.path.join(directory, INDEX_FILE), data.index.values.astype('datetime64[ns]'))
+
+def open_ohlcv_store(directory):
+    """저장소의 (OHLCV, 시각) 배열을 읽기 전용 메모리 맵으로 엽니다."""
+    ohlcv = np.load(os.path.join(directory, OHLCV_FILE), mmap_mode='r')
+    index = np.load(os.path.join(directory, INDEX_FILE), mmap_mode='r')
+    return ohlcv, index
+
+def open_indicator_store(directory):
+    """계산된 지표 배열(메모리 맵)과 컬럼 이름 목록을 반환합니다."""
+    indicators = np.load(os.path.join(directory, INDICATORS_FILE), mmap_mode='r')
+    with open(os.path.join(directory, INDICATOR_COLUMNS_FILE), 'r', encoding='utf-8') as f:
+        columns = json.load(f)
+    return indicators, columns
+
+def load_indicator_frame(directory, start=0, stop=None):
+    """저장소의 일부 구간을 OHLCV + 지표 데이터프레임으로 읽습니다. (결과 확인용)"""
+    ohlcv, index = open_ohlcv_store(directory)
+    indicators, columns = open_indicator_store(directory)
+    frame = pd.DataFrame(np.asarray(ohlcv[start:stop]), columns=OHLCV_COLUMNS,
+                         index=pd.DatetimeIndex(np.asarray(index[start:stop]), name='Date'))
+    for j, column in enumerate(columns):
+        frame[column] = np.asarray(indicators[start:stop, j])
+    return frame
+
+
+# --- 2. 재귀 지표의 청크 간 상태 이어받기 ---
+
+def _ewm_continue(values, previous, **ewm_kwargs):
+    """
+    adjust=False EWM을 이전 청크의 마지막 값에서 이어서 계산합니다.
+    이전 값을 맨 앞에 붙이면 pandas의 재귀식(y = (1-a)·y_prev + a·x)이 전체 계산과 똑같은 순서로 진행됩니다.
+    """
+    if previous is None:
+        return pd.Series(values).ewm(adjust=False, **ewm_kwargs).mean().values
+    extended = np.concatenate([[previous], values])
+    return pd.Series(extended).ewm(adjust=False, **ewm_kwargs).mean().values[1:]
+
+def _converged_weight_steps(com, limit=100_000):
+    """adjust=True EWM의 누적 가중치가 부동소수점에서 더 이상 변하지 않게 되는 관측 수를 구합니다."""
+    factor = 1 - 1 / (1 + com)
+    weight = 1.0
+    for step in range(1, limit):
+        new_weight = weight * factor + 1.0
+        if new_weight == weight:
+            return step
+        weight = new_weight
+    return limit
+
+def _ewm_adjusted_continue(values, state, com, min_periods):
+    """
+    adjust=True EWM(RSI 평균 상승/하락폭)을 이전 청크의 (마지막 평균, 관측 수)에서 이어서 계산합니다.
+    pandas는 평균과 누적 가중치를 상태로 가지므로, 마지막 평균을 관측 수만큼(가중치가 수렴했으면 수렴 시점까지만)
+    앞에 반복해 붙여 같은 상태를 재현합니다. 반환값: (결과, 새 상태)
+    """
+    n_prepend = 0
+    if state is not None and state[1] > 0:
+        last_mean, n_obs = state
+        n_prepend = min(n_obs, max(_converged_weight_steps(com), min_periods))
+        values = np.concatenate([np.full(n_prepend, last_mean), values])
+    else:
+        n_obs = 0
+
+    raw = pd.Series(values).ewm(com=com, adjust=True).mean().values[n_prepend:]
+    observed = ~np.isnan(values[n_prepend:])
+    total_obs = n_obs + np.cumsum(observed)
+
+    result = raw.copy()
+    result[total_obs < min_periods] = np.nan
+    return result, (raw[-1], int(total_obs[-1]))
+
+def _recursive_indicators(chunk, state, rsi_period, fast_period, slow_period, signal_period, atr_period):
+    """RSI/MACD/ATR/OBV를 이전 청크 상태에서 이어서 계산합니다. 반환값: ({컬럼: 값}, 새 상태)"""
+    close = chunk['Close'].values
+    high = chunk['High'].values
+    low = chunk['Low'].values
+    volume = chunk['Volume'].values
+    state = state or {}
+
+    # 이전 종가를 붙여 diff/shift가 전체 계산과 같은 값을 갖게 합니다.
+    previous_close = pd.Series(np.concatenate([[state.get('close', np.nan)], close]))
+    prev_close = previous_close.shift(1).values[1:]
+    delta = previous_close.diff().values[1:]
+
+    # RSI
+    up = np.where(delta < 0, 0, delta)
+    down = np.where(delta > 0, 0, delta)
+    avg_gain, gain_state = _ewm_adjusted_continue(up, state.get('gain'), rsi_period - 1, rsi_period)
+    avg_loss, loss_state = _ewm_adjusted_continue(np.abs(down), state.get('loss'), rsi_period - 1, rsi_period)
+    rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+
+    # MACD
+    ema_fast = _ewm_continue(close, state.get('ema_fast'), span=fast_period)
+    ema_slow = _ewm_continue(close, state.get('ema_slow'), span=slow_period)
+    macd = ema_fast - ema_slow
+    macd_signal = _ewm_continue(macd, state.get('macd_signal'), span=signal_period)
+
+    # ATR
+    true_range = pd.DataFrame({
+        'high_low': high - low,
+        'high_close': np.abs(high - prev_close),
+        'low_close': np.abs(low - prev_close),
+    }).max(axis=1).values
+    atr = _ewm_continue(true_range, state.get('atr'), alpha=1 / atr_period)
+
+    # OBV
+    obv_change = np.where(close > prev_close, volume, -np.where(close < prev_close, volume, 0))
+    obv = pd.Series(np.concatenate([[state.get('obv', 0.0)], obv_change])).cumsum().values[1:]
+
+    values = {
+        'RSI': rsi,
+        'MACD': macd,
+        'MACD_Signal': macd_signal,
+        'MACD_Hist': macd - macd_signal,
+        'ATR': atr,
+        'OBV': obv,
+    }
+    new_state = {
+        'close': close[-1],
+        'gain': gain_state,
+        'loss': loss_state,
+        'ema_fast': ema_fast[-1],
+        'ema_slow': ema_slow[-1],
+        'macd_signal': macd_signal[-1],
+        'atr': atr[-1],
+        'obv': obv[-1],
+    }
+    return values, new_state
+
+
+# --- 3. 청크 단위 지표 계산 ---
+
+def compute_indicators_chunked(directory, chunk_size=DEFAULT_CHUNK_SIZE, short_window=5, long_window=20,
+                               rsi_period=14, fast_period=12, slow_period=26, signal_period=9,
+                               bb_period=20, bb_std=2, atr_period=14, stoch_k=14, stoch_d=3):
+    """
+    저장소의 OHLCV를 chunk_size 행씩 읽어 add_sma + add_technical_indicators와 같은 지표를 계산하고
+    indicators.npy에 씁니다. 최대 메모리 사용량은 청크 크기(+ 워밍업 구간)에 비례합니다.
+
+    - rolling 지표(SMA, BB, Stochastic, CCI): 앞 청크의 마지막 warmup 행을 겹쳐 계산
+    - 재귀 지표(RSI, MACD, ATR, OBV): 앞 청크의 마지막 상태를 이어받아 계산
+    결측치가 없는 OHLCV를 가정합니다.
+    """
+    ohlcv, _ = open_ohlcv_store(directory)
+    n_rows = len(ohlcv)
+
+    # CCI는 20일 평균의 20일 평균편차를 쓰므로 가장 긴 의존 구간은 bb_period * 2입니다.
+    warmup = max(short_window, long_window, bb_period * 2, stoch_k + stoch_d)
+    chunk_size = max(chunk_size, warmup + 1)
+
+    # 지표 컬럼 순서는 인메모리 계산 결과와 같게 맞춥니다.
+    sample = pd.DataFrame(np.asarray(ohlcv[:warmup + 1]), columns=OHLCV_COLUMNS)
+    sample = add_technical_indicators(add_sma(sample, short_window, long_window), rsi_period, fast_period,
+                                      slow_period, signal_period, bb_period, bb_std, atr_period, stoch_k, stoch_d)
+    columns = [column for column in sample.columns if column not in OHLCV_COLUMNS]
+
+    output = open_memmap(os.path.join(directory, INDICATORS_FILE), mode='w+', dtype='float64',
+                         shape=(n_rows, len(columns)))
+    state = None
+    for start, stop in _iter_chunks(n_rows, chunk_size):
+        overlap_start = max(0, start - warmup)
+        frame = pd.DataFrame(np.asarray(ohlcv[overlap_start:stop]), columns=OHLCV_COLUMNS)
+        if frame.isna().values.any():
+            raise ValueError(f"{start}~{stop}행에 결측치가 있습니다. 저장 전에 결측치를 채워 주세요.")
+
+        indicators = add_technical_indicators(add_sma(frame, short_window, long_window), rsi_period, fast_period,
+                                              slow_period, signal_period, bb_period, bb_std, atr_period,
+                                              stoch_k, stoch_d).iloc[start - overlap_start:]
+        recursive, state = _recursive_indicators(frame.iloc[start - overlap_start:], state, rsi_period,
+                                                 fast_period, slow_period, signal_period, atr_period)
+
+        for j, column in enumerate(columns):
+            output[start:stop, j] = recursive[column] if column in _RECURSIVE_COLUMNS else indicators[column].values
+
+    output.flush()
+    with open(os.path.join(directory, INDICATOR_COLUMNS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(columns, f)
+    return columns
+
+
+# --- 4. 청크 단위 학습 윈도우 생성 ---
+
+def _feature_block(ohlcv, indicators, indicator_columns, features, start, stop):
+    """start~stop 행의 피처 행렬을 features 순서로 만듭니다. 감성 점수가 없으면 0.0으로 채웁니다."""
+    block = np.zeros((stop - start, len(features)))
+    for j, feature in enumerate(features):
+        if feature in OHLCV_COLUMNS:
+            block[:, j] = ohlcv[start:stop, OHLCV_COLUMNS.index(feature)]
+        elif feature in indicator_columns:
+            block[:, j] = indicators[start:stop, indicator_columns.index(feature)]
+        elif feature != 'Sentiment_Score':
+            raise ValueError(f"저장소에 없는 피처입니다: {feature}")
+    return block
+
+def fit_scaler_chunked(directory, features, scaler, chunk_size=DEFAULT_CHUNK_SIZE):
+    """저장소 전체를 청크 단위로 읽으며 스케일러(modules.scaler.StreamingScaler)를 점진적으로 학습합니다."""
+    ohlcv, index = open_ohlcv_store(directory)
+    indicators, indicator_columns = open_indicator_store(directory)
+    for start, stop in _iter_chunks(len(ohlcv), chunk_size):
+        block = _feature_block(ohlcv, indicators, indicator_columns, features, start, stop)
+        scaler.partial_fit(block, index[stop - 1])
+    return scaler
+
+def create_dataset_chunked(directory, lookback, features, scaler=None, chunk_size=DEFAULT_WINDOW_CHUNK_SIZE,
+                           dtype='float64'):
+    """
+    prediction.create_dataset과 같은 (X, Y)를 청크 단위로 만들어 X.npy / Y.npy에 씁니다.
+    scaler가 주어지면 각 청크를 변환한 뒤 윈도우를 만듭니다. 반환값은 읽기 전용 메모리 맵 (X, Y)입니다.
+    """
+    ohlcv, _ = open_ohlcv_store(directory)
+    indicators, indicator_columns = open_indicator_store(directory)
+    n_windows = len(ohlcv) - lookback
+    if n_windows <= 0:
+        raise ValueError("데이터가 lookback보다 짧아 학습 윈도우를 만들 수 없습니다.")
+
+    x_path = os.path.join(directory, X_FILE)
+    y_path = os.path.join(directory, Y_FILE)
+    X = open_memmap(x_path, mode='w+', dtype=dtype, shape=(n_windows, lookback, len(features)))
+    Y = open_memmap(y_path, mode='w+', dtype=dtype, shape=(n_windows,))
+
+    for start, stop in _iter_chunks(n_windows, chunk_size):
+        # 윈도우 start~stop-1에는 행 start ~ stop-1+lookback이 필요합니다.
+        block = _feature_block(ohlcv, indicators, indicator_columns, features, start, stop + lookback)
+        if scaler is not None:
+            block = scaler.transform(block)
+        windows = sliding_window_view(block, lookback, axis=0)  # (윈도우, 피처, lookback)
+        X[start:stop] = windows[:stop - start].transpose(0, 2, 1)
+        Y[start:stop] = block[lookback:, 0]
+
+    X.flush()
+    Y.flush()
+    del X, Y
+    return np.load(x_path, mmap_mode='r'), np.load(y_path, mmap_mode='r')
+
+
+# --- 5. 인메모리 계산과의 비교 ---
+
+def _max_error(chunked_values, expected):
+    """NaN 위치가 같은지 확인하고, 최대 절대 오차와 인메모리 값의 최대 절댓값으로 나눈 오차를 반환합니다."""
+    chunked_values = np.asarray(chunked_values, dtype=float)
+    expected = np.asarray(expected, dtype=float)
+    same_nan = bool(np.array_equal(np.isnan(chunked_values), np.isnan(expected)))
+    observed = ~np.isnan(expected)
+    if not observed.any():
+        return same_nan, 0.0, 0.0
+    abs_error = float(np.abs(chunked_values[observed] - expected[observed]).max())
+    scale = float(np.abs(expected[observed]).max())
+    return same_nan, abs_error, abs_error / scale if scale > 0 else abs_error
+
+def verify_against_in_memory(data, lookback=60, features=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                             window_chunk_size=DEFAULT_WINDOW_CHUNK_SIZE, tolerance=VERIFY_TOLERANCE):
+    """
+    같은 OHLCV로 청크 계산과 인메모리 계산(add_sma + add_technical_indicators, prediction.create_dataset)을
+    모두 수행해 지표 컬럼과 학습 윈도우(X, Y)의 오차를 비교합니다.
+    NaN 위치가 다르거나 오차가 tolerance를 넘는 항목이 있으면 AssertionError를 냅니다. 반환값: 항목별 오차 데이터프레임
+    """
+    from modules.prediction import FEATURES, create_dataset
+    from modules.scaler import StreamingScaler
+
+    features = features or FEATURES
+    expected = add_technical_indicators(add_sma(data[OHLCV_COLUMNS].copy()))
+    if 'Sentiment_Score' not in expected.columns:
+        expected['Sentiment_Score'] = 0.0
+
+    directory = tempfile.mkdtemp(prefix='chunked_verify_')
+    try:
+        save_ohlcv_store(data, directory)
+        columns = compute_indicators_chunked(directory, chunk_size=chunk_size)
+        indicators, _ = open_indicator_store(directory)
+
+        rows = {}
+        for j, column in enumerate(columns):
+            rows[column] = _max_error(indicators[:, j], expected[column].values)
+
+        # 학습 윈도우: 스케일러도 각 방식으로 따로 학습합니다.
+        scaler = fit_scaler_chunked(directory, features, StreamingScaler(), chunk_size=chunk_size)
+        X, Y = create_dataset_chunked(directory, lookback, features, scaler, chunk_size=window_chunk_size)
+        reference = StreamingScaler().fit(expected[features].values)
+        X_expected, Y_expected = create_dataset(reference.transform(expected[features].values), lookback)
+        rows['X'] = _max_error(X, X_expected)
+        rows['Y'] = _max_error(Y, Y_expected)
+        del X, Y, indicators
+    finally:
+        # Windows에서는 메모리 맵이 아직 열려 있으면 삭제되지 않을 수 있으므로 실패는 무시합니다.
+        shutil.rmtree(directory, ignore_errors=True)
+
+    report = pd.DataFrame.from_dict(rows, orient='index', columns=['same_nan', 'max_abs_error', 'max_rel_error'])
+    failed = report[~report['same_nan'] | (report['max_rel_error'] > tolerance)]
+    if not failed.empty:
+        raise AssertionError(f"인메모리 계산과 결과가 다릅니다 (허용 오차 {tolerance}):\n{failed}")
+    return report
+
+def _synthetic_ohlcv(n_rows, seed=0, start_price=30000.0):
+    """검증용 무작위 보행 분봉 OHLCV를 만듭니다."""
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.002, n_rows)))
+    open_ = np.concatenate([[start_price], close[:-1]])
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.002, n_rows))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.002, n_rows))
+    volume = rng.uniform(1, 1000, n_rows)
+    index = pd.date_range('2020-01-01', periods=n_rows, freq='min', name='Date')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+
+def main():
+    parser = argparse.ArgumentParser(description="청크 단위 지표/학습 윈도우 계산")
+    parser.add_argument('command', choices=['verify'])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--chunk-size', type=int, default=777)
+    parser.add_argument('--window-chunk-size', type=int, default=1001)
+    parser.add_argument('--lookback', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    data = _synthetic_ohlcv(args.rows, args.seed)
+    report = verify_against_in_memory(data, args.lookback, chunk_size=args.chunk_size,
+                                      window_chunk_size=args.window_chunk_size)
+    print(report.to_string())
+    print(f"인메모리 계산과 일치 (허용 오차 {VERIFY_TOLERANCE})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+"""
+데이터 계층(crypto), 화면 계층(view), 오프라인 배치 모듈(chunked 등)이 함께 쓰는 상수와 함수입니다.
+streamlit, yfinance, plotly 없이 임포트할 수 있도록 numpy 외의 의존성을 두지 않습니다.
+"""
+import numpy as np
+
+# 표준 OHLCV 스키마: 가격 데이터는 가져오는 시점에 이 형태로 한 번만 변환되어 캐시됩니다.
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# 개요 화면 스파크라인에 사용하는 고정 점 개수
+SPARKLINE_POINTS = 48
+
+
+def downsample_series(values, n_points=SPARKLINE_POINTS):
+    """시계열을 균등 간격 선형 보간으로 고정된 n_points개 점으로 줄입니다. (첫 값과 마지막 값은 보존)"""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) <= n_points:
+        return values
+    positions = np.linspace(0, len(values) - 1, n_points)
+    return np.interp(positions, np.arange(len(values)), values)
@@ -1,7 +1,10 @@
+import pandas as pd
 import yfinance as yf
 import requests
 import streamlit as st
 
+from modules.common import OHLCV_COLUMNS, SPARKLINE_POINTS, downsample_series
+
 # 🌟🌟🌟 코인 목록을 여기서 정의하고 다른 파일에서 공유합니다. 🌟🌟🌟
 COIN_LIST = {
     "Bitcoin (BTC)": {"coingecko": "bitcoin", "yfinance": "BTC-USD"},
@@ -14,6 +17,63 @@ COIN_LIST = {
 }
 # 🌟🌟🌟🌟🌟🌟🌟🌟🌟🌟🌟
 
+# 공급자별 컬럼 이름(소문자) -> 표준 컬럼 이름
+_COLUMN_ALIASES = {
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'close': 'Close',
+    'adj close': 'Adj Close',
+    'adj_close': 'Adj Close',
+    'adjclose': 'Adj Close',
+    'volume': 'Volume',
+}
+
+def normalize_ohlcv(raw, symbol=None):
+    """
+    yfinance 등 공급자의 출력을 표준 OHLCV 데이터프레임으로 변환합니다.
+
+    - 컬럼: Open, High, Low, Close, Volume (모두 float64, 이 순서)
+    - 인덱스: 'Date' 이름의 tz-naive(UTC 기준) DatetimeIndex, 시간순 정렬, 중복 시각 제거
+    - MultiIndex 컬럼((Price, Ticker) 형태)은 가격 필드 레벨을 찾아 평탄화하고, symbol이 있으면 해당 코인만 선택합니다.
+    필수 컬럼이 없거나 여러 코인이 섞여 있으면 ValueError를 발생시킵니다.
+    """
+    df = raw
+    if isinstance(df.columns, pd.MultiIndex):
+        # 가격 필드(Open/Close 등)가 들어 있는 레벨을 찾습니다.
+        field_level = next(
+            (level for level in range(df.columns.nlevels)
+             if {str(c).strip().lower() for c in df.columns.get_level_values(level)} & set(_COLUMN_ALIASES)),
+            0,
+        )
+        other_levels = [level for level in range(df.columns.nlevels) if level != field_level]
+        if symbol is not None and len(other_levels) == 1 and symbol in df.columns.get_level_values(other_levels[0]):
+            df = df.xs(symbol, axis=1, level=other_levels[0])
+        else:
+            df = df.set_axis(df.columns.get_level_values(field_level), axis=1)
+
+    if df.columns.duplicated().any():
+        raise ValueError("여러 코인의 데이터가 섞여 있습니다. symbol을 지정해 주세요.")
+
+    df = df.rename(columns=lambda col: _COLUMN_ALIASES.get(str(col).strip().lower(), col))
+    if 'Close' not in df.columns and 'Adj Close' in df.columns:
+        df = df.rename(columns={'Adj Close': 'Close'})
+
+    missing_cols = [col for col in OHLCV_COLUMNS if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"데이터에 필수 컬럼이 없습니다: {missing_cols}")
+
+    # 새 객체로 만들어 원본(공급자 출력)과 메모리를 공유하지 않게 합니다.
+    df = df[OHLCV_COLUMNS].astype('float64', copy=True).rename_axis(columns=None)
+
+    index = pd.DatetimeIndex(pd.to_datetime(df.index))
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    df.index = index.rename('Date')
+
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df.dropna(how='all')
+
 @st.cache_data(ttl=60)
 def get_crypto_price(symbol="bitcoin"):
     """CoinGecko API를 사용해 현재 코인 가격을 가져옵니다."""
@@ -26,11 +86,65 @@ def get_crypto_price(symbol="bitcoin"):
         st.error(f"API 요청 실패: {e}")
         return None
 
+@st.cache_data(ttl=60)
+def get_crypto_prices(symbols):
+    """여러 코인의 현재 가격을 CoinGecko 요청 한 번으로 가져옵니다. {심볼: 가격} 형태로 반환합니다."""
+    url = f"https://api.coingecko.com/api/v3/simple/price?ids={','.join(symbols)}&vs_currencies=usd"
+    try:
+        res = requests.get(url, timeout=5)
+        res.raise_for_status()
+        data = res.json()
+        return {symbol: data.get(symbol, {}).get("usd", None) for symbol in symbols}
+    except requests.exceptions.RequestException as e:
+        st.error(f"API 요청 실패: {e}")
+        return {symbol: None for symbol in symbols}
+
 @st.cache_data(ttl=300)
 def get_crypto_history(symbol, period="1mo", interval="1d"):
     """yfinance를 사용해 코인의 과거 시세 데이터를 가져옵니다."""
-    data = yf.download(symbol, period=period, interval=interval)
+    data = yf.download(symbol, period=period, interval=interval, progress=False)
     if data.empty:
         st.warning("데이터를 불러오지 못했습니다. 기간을 변경해 보세요.")
         return None
-    return data
+    
+    # 표준 OHLCV 형태로 한 번만 변환해 캐시합니다. (st.cache_data는 호출마다 복사본을 돌려주므로
+    # 화면 코드에서 값을 바꿔도 캐시된 원본은 바뀌지 않습니다.)
+    try:
+        return normalize_ohlcv(data, symbol)
+    except ValueError as e:
+        st.warning(f"데이터 형식 오류: {e}")
+        return None
+
+@st.cache_data(ttl=300)
+def get_crypto_close_matrix(symbols, period="1y", interval="1d"):
+    """여러 코인의 데이터를 한 번의 yfinance 요청으로 받아 표준화한 뒤 종가만 (시간 × 코인) 행렬로 반환합니다."""
+    data = yf.download(list(symbols), period=period, interval=interval, progress=False)
+    if data.empty:
+        st.warning("데이터를 불러오지 못했습니다. 기간을 변경해 보세요.")
+        return None
+    closes = {}
+    for symbol in symbols:
+        try:
+            closes[symbol] = normalize_ohlcv(data, symbol)['Close']
+        except ValueError:
+            continue
+    return pd.DataFrame(closes)
+
+@st.cache_data(ttl=300)
+def get_sparkline_series(symbols, period="7d", interval="1h", n_points=SPARKLINE_POINTS):
+    """
+    개요 화면용 스파크라인 데이터를 데이터 갱신 시점에 한 번만 계산합니다.
+    {심볼: (다운샘플된 종가 리스트, 기간 수익률 %)} 형태로 반환하며, 데이터가 없는 코인은 제외됩니다.
+    """
+    closes = get_crypto_close_matrix(symbols, period=period, interval=interval)
+    if closes is None:
+        return {}
+
+    series = {}
+    for symbol in closes.columns:
+        close = closes[symbol].dropna()
+        if len(close) < 2:
+            continue
+        change = (close.iloc[-1] / close.iloc[0] - 1) * 100
+        series[symbol] = (downsample_series(close.values, n_points).tolist(), change)
+    return series
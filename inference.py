@@ -0,0 +1,448 @@
+"""
+로컬 추론 서버 (Micro-batching)
+
+여러 Streamlit 세션이 각자 모델을 로드해 단일 윈도우로 model.predict를 호출하는 대신,
+별도 프로세스 하나가 모델을 보유하고 짧은 시간(BATCH_WINDOW_MS) 동안 모인 요청을
+모델별로 묶어 한 번의 배치 추론으로 처리합니다.
+
+실행:
+    python -m modules.inference serve                 # 서버 실행
+    python -m modules.inference simulate --dummy      # 더미 모델 + 동시 클라이언트 부하 테스트
+"""
+import argparse
+import os
+import queue
+import secrets
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Connection, answer_challenge, deliver_challenge
+
+import numpy as np
+
+# 서버 주소 (환경 변수로 변경 가능)
+SERVER_ADDRESS = (os.environ.get('CRYPTO_INFERENCE_HOST', '127.0.0.1'),
+                  int(os.environ.get('CRYPTO_INFERENCE_PORT', '6010')))
+# 인증 키: CRYPTO_INFERENCE_AUTHKEY가 없으면 설치별로 생성되는 비밀 키 파일을 사용합니다.
+AUTH_KEY_FILE = os.environ.get('CRYPTO_INFERENCE_KEYFILE',
+                               os.path.join(os.path.expanduser('~'), '.crypto_inference_key'))
+
+# 요청을 모으는 시간(ms)과 한 번에 처리할 최대 요청 수
+BATCH_WINDOW_MS = 5
+MAX_BATCH_SIZE = 64
+
+# 클라이언트가 서버 연결과 인증을 기다리는 최대 시간(초)
+CONNECT_TIMEOUT = 5
+
+
+def get_auth_key():
+    """
+    서버와 클라이언트가 공유하는 인증 키를 반환합니다.
+    연결은 받은 데이터를 unpickle하므로 키는 저장소에 공개된 값이 아니라, 환경 변수로 주거나
+    처음 사용할 때 무작위로 만들어 소유자만 읽을 수 있는 AUTH_KEY_FILE에 저장한 값을 씁니다.
+    """
+    key = os.environ.get('CRYPTO_INFERENCE_AUTHKEY')
+    if key:
+        return key.encode()
+
+    if not os.path.exists(AUTH_KEY_FILE):
+        # 임시 파일에 다 쓴 뒤 링크하므로 동시에 시작한 프로세스도 빈 키를 읽지 않고 같은 키를 쓰게 됩니다.
+        tmp_path = f"{AUTH_KEY_FILE}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp_path, AUTH_KEY_FILE)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+
+    with open(AUTH_KEY_FILE, 'r', encoding='utf-8') as f:
+        key = f.read().strip()
+    if not key:
+        raise ValueError(f"인증 키 파일이 비어 있습니다: {AUTH_KEY_FILE}")
+    return key.encode()
+
+
+def _default_model_dir():
+    # prediction이 이 모듈을 임포트하므로 순환 임포트를 피해 필요할 때 가져옵니다.
+    from modules.prediction import MODEL_DIR
+    return MODEL_DIR
+
+
+def forecast_batch(model, windows, steps):
+    """
+    (배치, LOOKBACK, 피처) 형태의 정규화된 윈도우들에 대해 steps일 앞까지 재귀적으로 예측합니다.
+    매 단계는 배치 전체에 대한 한 번의 forward pass입니다. 결과는 (배치, steps) 배열입니다.
+    """
+    current = np.array(windows, dtype=float)
+    predictions = np.zeros((len(current), steps))
+
+    for step in range(steps):
+        predicted = np.asarray(model.predict(current, verbose=0)).reshape(len(current), -1)[:, 0]
+        predictions[:, step] = predicted
+
+        # 시퀀스 업데이트: 한 칸 앞으로 밀고 마지막 행의 종가를 예측값으로 교체
+        current = np.roll(current, -1, axis=1)
+        current[:, -1, 0] = predicted
+
+    return predictions
+
+
+def _load_keras_model(model_path):
+    # tensorflow는 무거우므로 서버 프로세스에서 실제로 모델을 로드할 때만 임포트합니다.
+    from tensorflow.keras.models import load_model
+    return load_model(model_path)
+
+
+class _ForecastRequest:
+    def __init__(self, model_path, window, steps):
+        self.model_path = model_path
+        self.window = np.asarray(window, dtype=float)
+        self.steps = int(steps)
+        self.future = Future()
+
+
+class InferenceServer:
+    """모델을 한 번만 로드해 보유하고, 동시에 들어온 예측 요청을 모델별 배치로 처리합니다."""
+
+    def __init__(self, address=SERVER_ADDRESS, authkey=None, model_loader=_load_keras_model,
+                 batch_window_ms=BATCH_WINDOW_MS, max_batch_size=MAX_BATCH_SIZE, model_dir=None):
+        self.address = address
+        self.authkey = authkey if authkey is not None else get_auth_key()
+        self.model_loader = model_loader
+        # 이 폴더 밖의 모델 파일은 불러오지 않습니다.
+        self.model_dir = os.path.realpath(model_dir or _default_model_dir())
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+
+        self._requests = queue.Queue()
+        self._models = {}  # model_path -> (mtime, model)
+        self._listener = None
+        self._stopped = threading.Event()
+        self._batch_thread = threading.Thread(target=self._batch_loop, daemon=True)
+        self.stats = {'requests': 0, 'batches': 0}
+
+    # --- 1. 모델 관리 ---
+
+    def _get_model(self, model_path):
+        """모델을 캐시에서 가져옵니다. 파일이 갱신(재학습)되었으면 다시 로드합니다."""
+        mtime = os.path.getmtime(model_path) if os.path.exists(model_path) else None
+        cached = self._models.get(model_path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, self.model_loader(model_path))
+            self._models[model_path] = cached
+        return cached[1]
+
+    def _resolve_model_path(self, model_path):
+        """요청된 모델 경로가 모델 저장소(model_dir) 안에 있는지 확인하고 실제 경로를 반환합니다."""
+        path = os.path.realpath(model_path)
+        try:
+            inside = os.path.commonpath([path, self.model_dir]) == self.model_dir
+        except ValueError:
+            # 드라이브가 다른 경로 (Windows)
+            inside = False
+        if not inside:
+            raise PermissionError(f"모델 저장소 밖의 경로입니다: {model_path}")
+        return path
+
+    # --- 2. 배치 처리 ---
+
+    def submit(self, model_path, window, steps):
+        """예측 요청을 큐에 넣고 Future를 반환합니다. (프로세스 내부에서 직접 호출 가능)"""
+        request = _ForecastRequest(model_path, window, steps)
+        self._requests.put(request)
+        return request.future
+
+    def _collect_batch(self):
+        """첫 요청이 도착한 뒤 batch_window 동안(또는 max_batch_size까지) 요청을 모읍니다."""
+        try:
+            first = self._requests.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_group(self, model_path, requests):
+        try:
+            model = self._get_model(model_path)
+            windows = np.stack([request.window for request in requests])
+            predictions = forecast_batch(model, windows, max(request.steps for request in requests))
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        for request, row in zip(requests, predictions):
+            request.future.set_result(row[:request.steps])
+
+    def _batch_loop(self):
+        while not self._stopped.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            # 모델 경로와 윈도우 형태가 같은 요청끼리만 하나의 배치로 묶습니다.
+            groups = {}
+            for request in batch:
+                groups.setdefault((request.model_path, request.window.shape), []).append(request)
+            self.stats['requests'] += len(batch)
+            self.stats['batches'] += len(groups)
+            for (model_path, _), requests in groups.items():
+                self._run_group(model_path, requests)
+
+    # --- 3. 네트워크 ---
+
+    def _handle_connection(self, sock):
+        """
+        한 연결의 인증을 마친 뒤 들어오는 요청을 순서대로 처리합니다. 연결마다 별도 스레드에서 실행되므로
+        인증에 실패하거나 응답하지 않는 클라이언트가 있어도 다른 연결의 수락은 멈추지 않습니다.
+        """
+        with Connection(sock.detach()) as conn:
+            try:
+                # multiprocessing.connection.Listener.accept와 같은 순서의 상호 인증
+                deliver_challenge(conn, self.authkey)
+                answer_challenge(conn, self.authkey)
+            except (AuthenticationError, EOFError, OSError) as e:
+                print(f"클라이언트 인증 실패: {e}")
+                return
+
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                if not isinstance(message, dict):
+                    conn.send({'ok': False, 'error': f"잘못된 요청 형식입니다: {type(message).__name__}"})
+                    continue
+
+                if message.get('type') == 'ping':
+                    conn.send({'ok': True})
+                    continue
+
+                try:
+                    model_path = self._resolve_model_path(message['model_path'])
+                    future = self.submit(model_path, message['window'], message['steps'])
+                    conn.send({'ok': True, 'predictions': future.result()})
+                except Exception as e:
+                    conn.send({'ok': False, 'error': f"{type(e).__name__}: {e}"})
+
+    def start(self):
+        """소켓을 열고 배치 스레드를 시작합니다."""
+        self._listener = socket.create_server(self.address, backlog=128)
+        # shutdown 후 accept 루프가 빠져나올 수 있도록 주기적으로 깨어납니다.
+        self._listener.settimeout(0.5)
+        self.address = self._listener.getsockname()[:2]
+        self._batch_thread.start()
+        return self
+
+    def serve_forever(self):
+        if self._listener is None:
+            self.start()
+        print(f"추론 서버 실행 중: {self.address} (모델 저장소: {self.model_dir})")
+        while not self._stopped.is_set():
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                # 타임아웃이거나 shutdown으로 소켓이 닫힌 경우
+                continue
+            sock.setblocking(True)
+            # 인증 마지막 메시지와 요청처럼 작은 메시지가 연달아 오가므로 Nagle 지연(~40ms)을 끕니다.
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._handle_connection, args=(sock,), daemon=True).start()
+
+    def shutdown(self):
+        self._stopped.set()
+        if self._listener is not None:
+            self._listener.close()
+
+
+class InferenceClient:
+    """
+    추론 서버에 예측을 요청하는 얇은 클라이언트입니다.
+    스레드마다 인증된 연결 하나를 열어 두고 재사용하므로 요청마다 연결·인증 비용이 들지 않으며, 스레드 간에 안전합니다.
+    """
+
+    def __init__(self, address=SERVER_ADDRESS, authkey=None, timeout=30, connect_timeout=CONNECT_TIMEOUT,
+                 max_workers=8):
+        self.address = address
+        self.authkey = authkey if authkey is not None else get_auth_key()
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._executor = None
+        self._max_workers = max_workers
+        self._local = threading.local()
+
+    def _connect(self):
+        """
+        서버에 연결하고 인증합니다. multiprocessing.connection.Client와 같지만 연결과 인증에 시간 제한을 둡니다.
+        (포트는 열려 있지만 응답하지 않는 서버 때문에 페이지가 멈추지 않도록)
+        """
+        sock = socket.create_connection(self.address, timeout=self.connect_timeout)
+        sock.setblocking(True)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = Connection(sock.detach())
+        try:
+            if not conn.poll(self.connect_timeout):
+                raise TimeoutError("추론 서버 인증 응답 시간 초과")
+            answer_challenge(conn, self.authkey)
+            deliver_challenge(conn, self.authkey)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _close_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def _request(self, message):
+        conn = getattr(self._local, 'conn', None)
+        reused = conn is not None
+        try:
+            if conn is None:
+                conn = self._local.conn = self._connect()
+            conn.send(message)
+            if not conn.poll(self.timeout):
+                raise TimeoutError("추론 서버 응답 시간 초과")
+            response = conn.recv()
+        except (EOFError, ConnectionError):
+            self._close_connection()
+            if not reused:
+                raise
+            # 재사용하던 연결이 끊긴 경우(서버 재시작 등) 새 연결로 한 번만 다시 시도합니다.
+            return self._request(message)
+        except BaseException:
+            # 시간 초과 등으로 늦게 도착한 응답이 다음 요청의 응답으로 읽히지 않도록 연결을 버립니다.
+            self._close_connection()
+            raise
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+        return response
+
+    def ping(self):
+        """서버가 응답하면 True를 반환합니다."""
+        try:
+            self._request({'type': 'ping'})
+            return True
+        except (OSError, EOFError, AuthenticationError, RuntimeError):
+            return False
+
+    def forecast(self, model_path, window, steps):
+        """정규화된 윈도우 하나에 대해 steps일 예측 결과(정규화된 종가)를 반환합니다."""
+        response = self._request({
+            'type': 'forecast',
+            # 서버와 작업 디렉터리가 달라도 같은 파일을 가리키도록 절대 경로로 보냅니다.
+            'model_path': os.path.abspath(model_path),
+            'window': np.asarray(window, dtype=float),
+            'steps': steps,
+        })
+        return response['predictions']
+
+    def forecast_async(self, model_path, window, steps):
+        """forecast를 백그라운드에서 실행하고 Future를 반환합니다."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        return self._executor.submit(self.forecast, model_path, window, steps)
+
+
+# --- 4. 로컬 부하 테스트 ---
+
+class _DummyModel:
+    """부하 테스트용 모델: 배치 크기와 무관한 고정 비용 + 샘플당 비용을 흉내 냅니다."""
+
+    def __init__(self, fixed_cost=0.005, per_sample_cost=0.0001):
+        self.fixed_cost = fixed_cost
+        self.per_sample_cost = per_sample_cost
+
+    def predict(self, X, verbose=0):
+        time.sleep(self.fixed_cost + self.per_sample_cost * len(X))
+        return X[:, -1, :1] * 1.001
+
+
+def simulate_clients(address=SERVER_ADDRESS, authkey=None, model_path=None, n_clients=16,
+                     requests_per_client=10, lookback=60, n_features=16, steps=5):
+    """
+    n_clients개의 동시 클라이언트가 각각 requests_per_client번 예측을 요청하도록 시뮬레이션하고
+    처리량과 지연 시간 통계를 반환합니다.
+    """
+    client = InferenceClient(address, authkey)
+    # 서버는 모델 저장소 안의 경로만 받으므로 (더미 모델은 파일이 없어도 됩니다) 저장소 안의 경로를 씁니다.
+    model_path = model_path or os.path.join(_default_model_dir(), 'simulation', 'lstm_model.h5')
+    latencies = []
+    lock = threading.Lock()
+
+    def _worker(seed):
+        rng = np.random.default_rng(seed)
+        for _ in range(requests_per_client):
+            window = rng.random((lookback, n_features))
+            started = time.perf_counter()
+            predictions = client.forecast(model_path, window, steps)
+            assert len(predictions) == steps
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=_worker, args=(seed,)) for seed in range(n_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array(latencies)
+    return {
+        'requests': len(latencies),
+        'elapsed_sec': elapsed,
+        'throughput_rps': len(latencies) / elapsed,
+        'latency_p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'latency_p95_ms': float(np.percentile(latencies, 95) * 1000),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LSTM 로컬 추론 서버")
+    parser.add_argument('command', choices=['serve', 'simulate'])
+    parser.add_argument('--port', type=int, default=SERVER_ADDRESS[1])
+    parser.add_argument('--dummy', action='store_true', help="실제 모델 대신 더미 모델 사용")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=10)
+    args = parser.parse_args()
+
+    address = (SERVER_ADDRESS[0], args.port)
+    loader = (lambda path: _DummyModel()) if args.dummy else _load_keras_model
+
+    if args.command == 'serve':
+        InferenceServer(address, model_loader=loader).serve_forever()
+        return
+
+    # simulate: 같은 프로세스에서 서버를 띄우고 소켓을 통해 동시 클라이언트로 요청합니다.
+    server = InferenceServer((address[0], 0), model_loader=loader).start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        result = simulate_clients(server.address, n_clients=args.clients, requests_per_client=args.requests)
+    finally:
+        server.shutdown()
+    result['avg_batch_size'] = server.stats['requests'] / max(server.stats['batches'], 1)
+    for key, value in result.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,18 @@
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
 # tensorflow 자체가 무거워서 주석 처리 시간부자들만 하는걸 추천 pytorch버전은 추후 업데이트 
 #from tensorflow.keras.models import Sequential, load_model  
 #from tensorflow.keras.layers import LSTM, Dense, Dropout  
+import json
 import os
 
+from modules.inference import InferenceClient, forecast_batch
+from modules.scaler import StreamingScaler, get_scaler_path, load_scaler
+
 # 모델 저장 경로
 MODEL_PATH = 'lstm_model.h5' 
+# 코인별 모델/스케일러 저장 폴더
+MODEL_DIR = 'models'
 
 # 예측에 사용할 데이터 컬럼 목록
 FEATURES = ['Close', 'Volume', 
@@ -17,6 +22,111 @@ FEATURES = ['Close', 'Volume',
             'Sentiment_Score'] 
 
 LOOKBACK_DAYS = 60
+# 튜닝된 lookback의 상한. 코인 상세 화면의 짧은 기간(3개월, 약 90개 일봉)으로도 예측할 수 있어야 하므로
+# 기본값보다 긴 lookback은 쓰지 않습니다.
+MAX_LOOKBACK = LOOKBACK_DAYS
+
+# 모델 설정 기본값. 하이퍼파라미터 탐색(modules/tuning.py) 결과가 저장된 심볼은 그 설정을 사용합니다.
+DEFAULT_MODEL_CONFIG = {
+    'lookback': LOOKBACK_DAYS,
+    'units': 50,
+    'layers': 2,
+    'dropout': 0.2,
+    'epochs': 1,
+    'feature_columns': FEATURES,
+}
+BEST_CONFIG_FILE = 'best_config.json'
+
+# 정규화 방식 ('minmax' 또는 'robust')
+SCALER_METHOD = 'minmax'
+
+# 로컬 추론 서버(modules/inference.py) 사용 여부. 서버가 꺼져 있으면 세션 안에서 직접 예측합니다.
+USE_INFERENCE_SERVER = os.environ.get('CRYPTO_INFERENCE_SERVER', '0') == '1'
+
+# 증분 학습 설정: 모델이 있으면 새 봉이 포함된 윈도우 + 과거 윈도우 일부(replay)만으로 이어서 학습합니다.
+INCREMENTAL_TRAINING = True
+REPLAY_SIZE = 256            # 함께 다시 학습할 과거 윈도우 최대 개수
+VALIDATION_TAIL = 20         # 조기 종료 판단에 쓰는 최근 윈도우 수
+FINE_TUNE_EPOCHS = 5
+EARLY_STOPPING_PATIENCE = 2
+
+def get_model_path(symbol=None):
+    """코인별 모델 파일 경로를 반환합니다. 심볼이 없으면 기존 공용 모델 경로를 사용합니다."""
+    if symbol is None:
+        return MODEL_PATH
+    return os.path.join(MODEL_DIR, symbol, MODEL_PATH)
+
+def get_best_config_path(symbol):
+    """심볼별 최적 설정 파일 경로 (모델 파일과 같은 폴더)"""
+    return os.path.join(os.path.dirname(get_model_path(symbol)), BEST_CONFIG_FILE)
+
+def load_best_config(symbol):
+    """저장된 최적 설정을 불러옵니다. 없거나 읽을 수 없으면 None을 반환합니다."""
+    path = get_best_config_path(symbol)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"최적 설정 로드 실패 ({e}).")
+        return None
+
+def get_model_config(symbol=None):
+    """심볼의 모델 설정을 반환합니다. 튜닝된 최적 설정이 있으면 기본값 대신 그 값을 씁니다."""
+    config = dict(DEFAULT_MODEL_CONFIG)
+    best_config = load_best_config(symbol) if symbol is not None else None
+    if best_config and best_config.get('lookback', LOOKBACK_DAYS) > MAX_LOOKBACK:
+        # 예전 탐색 공간에서 나온 설정: 짧은 조회 기간에서 "데이터 부족"이 되지 않도록 기본 설정을 씁니다.
+        print(f"최적 설정의 lookback({best_config['lookback']})이 최대값({MAX_LOOKBACK})보다 커서 기본 설정을 사용합니다.")
+        best_config = None
+    if best_config:
+        config.update({key: best_config[key] for key in DEFAULT_MODEL_CONFIG if key in best_config})
+    return config
+
+def get_checkpoint_path(model_path):
+    """모델 옆에 저장되는 학습 체크포인트 정보 파일 경로를 반환합니다."""
+    base, _ = os.path.splitext(model_path)
+    return f"{base}_checkpoint.json"
+
+def load_checkpoint(model_path):
+    """마지막 학습 정보(마지막으로 학습한 봉의 시각 등)를 불러옵니다. 없으면 None을 반환합니다."""
+    path = get_checkpoint_path(model_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"체크포인트 정보 로드 실패 ({e}).")
+        return None
+
+def save_checkpoint(model_path, last_timestamp, mode, config=None):
+    """마지막으로 학습에 반영한 봉의 시각과 학습 방식(및 모델 설정)을 기록합니다."""
+    checkpoint = load_checkpoint(model_path) or {'n_updates': 0}
+    checkpoint.update({
+        'last_trained_timestamp': pd.Timestamp(last_timestamp).isoformat(),
+        'mode': mode,
+        'n_updates': checkpoint['n_updates'] + 1,
+    })
+    if config is not None:
+        checkpoint['config'] = config
+    # 쓰는 도중 다른 세션이 읽어도 깨진 파일을 보지 않도록 임시 파일에 쓴 뒤 교체합니다.
+    path = get_checkpoint_path(model_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def _save_model(model, model_path):
+    """
+    모델을 임시 파일에 저장한 뒤 교체합니다. 추론 서버가 mtime 변경을 보고 다시 불러올 때
+    쓰다 만 파일을 읽지 않게 합니다. (keras는 확장자로 저장 형식을 정하므로 확장자는 유지합니다.)
+    """
+    base, ext = os.path.splitext(model_path)
+    tmp_path = f"{base}.tmp{ext}"
+    model.save(tmp_path)
+    os.replace(tmp_path, model_path)
 
 def create_dataset(data, lookback):
     """LSTM 학습을 위해 시계열 데이터를 시퀀스 형태로 변환합니다."""
@@ -26,69 +136,235 @@ def create_dataset(data, lookback):
         Y.append(data[i, 0])
     return np.array(X), np.array(Y)
 
-def train_and_save_model(X_train, Y_train, units=50):
-    """LSTM 모델을 정의하고 학습 후 저장합니다."""
+def valid_window_mask(X, Y):
+    """지표 계산 초반(SMA20, 볼린저 밴드, CCI 등)의 NaN이 포함되지 않은 윈도우만 True인 마스크를 반환합니다."""
+    if len(X) == 0:
+        return np.zeros(0, dtype=bool)
+    return ~np.isnan(X).any(axis=(1, 2)) & ~np.isnan(Y)
+
+def build_lstm_model(input_shape, units=50, layers=2, dropout=0.2):
+    """LSTM 층 layers개(각 층 뒤 Dropout)와 출력 Dense 층으로 된 모델을 만들고 컴파일합니다."""
+    # tensorflow는 무거우므로 실제로 모델을 만들 때만 임포트합니다.
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+
     model = Sequential()
-    model.add(LSTM(units=units, return_sequences=True, input_shape=(X_train.shape[1], X_train.shape[2])))
-    model.add(Dropout(0.2))
-    model.add(LSTM(units=units, return_sequences=False))
-    model.add(Dropout(0.2))
+    for i in range(layers):
+        return_sequences = i < layers - 1
+        if i == 0:
+            model.add(LSTM(units=units, return_sequences=return_sequences, input_shape=input_shape))
+        else:
+            model.add(LSTM(units=units, return_sequences=return_sequences))
+        model.add(Dropout(dropout))
     model.add(Dense(units=1))
     model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+def train_and_save_model(X_train, Y_train, units=50, model_path=MODEL_PATH, scaler=None, last_timestamp=None,
+                         layers=2, dropout=0.2, epochs=1, config=None):
+    """
+    LSTM 모델을 정의하고 처음부터 학습한 뒤 저장합니다.
+    스케일러와 마지막 학습 봉의 시각이 주어지면 모델 옆에 함께 저장하고, 모델 설정(config)은 체크포인트에 기록합니다.
+    """
+    model = build_lstm_model((X_train.shape[1], X_train.shape[2]), units=units, layers=layers, dropout=dropout)
     
     # 학습
-    model.fit(X_train, Y_train, epochs=1, batch_size=32, verbose=0)
+    model.fit(X_train, Y_train, epochs=epochs, batch_size=32, verbose=0)
     
     # 모델 저장
     try:
-        model.save(MODEL_PATH)
-        print(f"모델 저장 완료: {MODEL_PATH}")
+        model_dir = os.path.dirname(model_path)
+        if model_dir:
+            os.makedirs(model_dir, exist_ok=True)
+        _save_model(model, model_path)
+        print(f"모델 저장 완료: {model_path}")
+        if scaler is not None:
+            scaler.save(get_scaler_path(model_path))
+        if last_timestamp is not None:
+            save_checkpoint(model_path, last_timestamp, mode='full', config=config)
     except Exception as e:
         print(f"모델 저장 실패: {e}")
         
     return model
 
-def get_future_price_prediction(data: pd.DataFrame, days_to_predict=5):
+def fine_tune_model(model, feature_frame, scaler, last_trained_timestamp, model_path=MODEL_PATH, lookback=LOOKBACK_DAYS, seed=42):
+    """
+    저장된 체크포인트(옵티마이저 상태 포함)에서 이어서 학습합니다.
+    마지막 학습 이후 추가된 봉을 예측 대상으로 하는 윈도우와, 과거 윈도우 중 최대 REPLAY_SIZE개를
+    무작위로 섞어 학습하고, 최근 VALIDATION_TAIL개 윈도우의 손실로 조기 종료한 뒤 그중 새 윈도우로 한 epoch 더 학습합니다.
+    새 봉을 반영한 스케일러로 학습하고 모델과 함께 저장하므로, 저장된 정규화 상태는 항상 모델이 학습한 상태와 같습니다.
+    반환값: (모델, 모델이 학습한 스케일러)
+    """
+    # tensorflow는 무거우므로 실제로 증분 학습을 할 때만 임포트합니다.
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    # 저장된 스케일러는 학습이 끝나 모델과 함께 저장할 때만 바꾸도록 복사본을 갱신합니다.
+    updated_scaler = StreamingScaler.from_dict(scaler.to_dict())
+    updated_scaler.update_from_frame(feature_frame)
+
+    X_all, Y_all = create_dataset(updated_scaler.transform(feature_frame.values), lookback)
+    target_times = pd.DatetimeIndex(feature_frame.index[lookback:])
+
+    # 지표 계산 초반의 NaN이 포함된 윈도우는 제외합니다.
+    valid = valid_window_mask(X_all, Y_all)
+    is_new = np.asarray(target_times > pd.Timestamp(last_trained_timestamp))
+    new_idx = np.flatnonzero(valid & is_new)
+    old_idx = np.flatnonzero(valid & ~is_new)
+    if len(new_idx) == 0:
+        return model, scaler
+
+    # 1. 조기 종료용 검증 구간: 가장 최근 윈도우들
+    val_idx = np.flatnonzero(valid)[-VALIDATION_TAIL:]
+    train_new = new_idx[new_idx < val_idx[0]]
+    if len(train_new) == 0:
+        # 새 봉이 적으면 새 윈도우는 모두 학습에 쓰고, 그 직전 과거 구간을 검증용으로 남깁니다.
+        train_new = new_idx
+        val_idx = old_idx[-VALIDATION_TAIL:]
+    if len(val_idx) == 0:
+        return model, scaler
+
+    # 2. 과거 윈도우 replay 샘플 (검증 구간 이전에서만)
+    rng = np.random.default_rng(seed)
+    replay_pool = old_idx[old_idx < val_idx[0]]
+    replay_idx = rng.choice(replay_pool, size=min(REPLAY_SIZE, len(replay_pool)), replace=False)
+    train_idx = np.concatenate([train_new, replay_idx])
+
+    # 3. 이어서 학습 (load_model로 불러온 옵티마이저 상태를 그대로 사용)
+    early_stopping = EarlyStopping(monitor='val_loss', patience=EARLY_STOPPING_PATIENCE, restore_best_weights=True)
+    model.fit(X_all[train_idx], Y_all[train_idx],
+              validation_data=(X_all[val_idx], Y_all[val_idx]),
+              epochs=FINE_TUNE_EPOCHS, batch_size=32, shuffle=True,
+              callbacks=[early_stopping], verbose=0)
+
+    # 4. 검증에만 쓰인 새 윈도우도 학습에 반영 (체크포인트가 이 윈도우들까지 학습한 것으로 기록되므로)
+    val_new = np.intersect1d(val_idx, new_idx)
+    if len(val_new) > 0:
+        model.fit(X_all[val_new], Y_all[val_new], epochs=1, batch_size=32, verbose=0)
+
+    try:
+        _save_model(model, model_path)
+        updated_scaler.save(get_scaler_path(model_path))
+        save_checkpoint(model_path, target_times[new_idx[-1]], mode='incremental')
+        print(f"증분 학습 완료: 새 윈도우 {len(np.union1d(train_new, val_new))}개 + replay {len(replay_idx)}개")
+    except Exception as e:
+        print(f"모델 저장 실패: {e}")
+
+    return model, updated_scaler
+
+_inference_client = None
+
+def _get_inference_client():
+    """세션(스레드)마다 인증된 연결을 재사용하도록 프로세스 전체에서 클라이언트 하나를 공유합니다."""
+    global _inference_client
+    if _inference_client is None:
+        _inference_client = InferenceClient()
+    return _inference_client
+
+def _fit_scaler(feature_frame):
+    """학습 구간 데이터로 새 스케일러를 학습합니다."""
+    scaler = StreamingScaler(method=SCALER_METHOD)
+    return scaler.fit(feature_frame.values, feature_frame.index[-1])
+
+def get_future_price_prediction(data: pd.DataFrame, days_to_predict=5, symbol=None):
     """
     주어진 과거 데이터를 기반으로 향후 N일의 시세를 예측하고 결과를 반환합니다.
+    정규화 상태는 모델 옆에 저장되며, 추론 시에는 마지막 lookback개 행만 변환합니다.
+    모델이 이미 있으면 처음부터 재학습하지 않고, 마지막 학습 이후 추가된 봉만 증분 학습합니다.
+    lookback, 피처, 모델 구조는 심볼별 최적 설정(get_model_config)을 따르며, 설정이 바뀌면 새로 학습합니다.
     """
-    if data is None or len(data) < LOOKBACK_DAYS + 1:
+    config = get_model_config(symbol)
+    lookback = config['lookback']
+    if data is None or len(data) < lookback + 1:
         return "데이터 부족", []
     
-    feature_data = data[FEATURES].values
+    feature_frame = data[config['feature_columns']]
+    model_path = get_model_path(symbol)
+    scaler_path = get_scaler_path(model_path)
+    
+    # 1. 저장된 모델과 스케일러 로드
+    # 체크포인트에 설정이 없는 모델은 기본 설정으로 학습된 것으로 봅니다.
+    checkpoint = load_checkpoint(model_path)
+    trained_config = (checkpoint or {}).get('config', DEFAULT_MODEL_CONFIG)
+    config_changed = os.path.exists(model_path) and trained_config != config
+    if config_changed:
+        print("모델 설정이 바뀌어 새 설정으로 다시 학습합니다.")
     
-    # 1. 스케일러 학습 및 데이터 정규화
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    scaled_data = scaler.fit_transform(feature_data)
+    model = None
+    scaler = None if config_changed else load_scaler(scaler_path, n_features=len(config['feature_columns']))
+    scaler_changed = False
+    needs_fine_tune = (INCREMENTAL_TRAINING and checkpoint is not None and not config_changed
+                       and feature_frame.index[-1] > pd.Timestamp(checkpoint['last_trained_timestamp']))
     
-    # 2. 모델 로드 또는 학습
-    if os.path.exists(MODEL_PATH):
+    # 학습된 모델과 스케일러가 있고 추론 서버가 떠 있으면 모델 로드는 서버에 맡깁니다.
+    # (증분 학습이 필요하면 이 세션에서 학습·저장하고, 서버는 갱신된 파일을 다시 불러옵니다.)
+    # 서버는 모델 저장소(MODEL_DIR) 안의 모델만 불러오므로 심볼 없는 공용 모델은 이 세션에서 예측합니다.
+    client = None
+    if (USE_INFERENCE_SERVER and symbol is not None and scaler is not None and os.path.exists(model_path)
+            and not needs_fine_tune and not config_changed):
+        client = _get_inference_client()
+        if not client.ping():
+            client = None
+    
+    if client is None and os.path.exists(model_path) and not config_changed:
+        # tensorflow는 무거우므로 실제로 모델을 불러올 때만 임포트합니다.
+        from tensorflow.keras.models import load_model
         try:
-            model = load_model(MODEL_PATH)
-        except Exception as e:
+            model = load_model(model_path)
+        except (OSError, ValueError) as e:
+            # 파일이 손상된 경우에만 재학습합니다. (임포트 오류 등은 그대로 전달)
             print(f"모델 로드 실패 ({e}). 재학습합니다.")
-            X_train, Y_train = create_dataset(scaled_data[:-days_to_predict], LOOKBACK_DAYS)
-            model = train_and_save_model(X_train, Y_train)
-    else:
-        X_train, Y_train = create_dataset(scaled_data[:-days_to_predict], LOOKBACK_DAYS)
-        model = train_and_save_model(X_train, Y_train)
-        
-    # 3. 향후 N일 예측
-    current_input = scaled_data[-LOOKBACK_DAYS:].copy()
-    future_predictions = []
-
-    for _ in range(days_to_predict):
-        X_input = current_input[np.newaxis, -LOOKBACK_DAYS:, :]
-        predicted_scaled_price = model.predict(X_input, verbose=0)[0]
-        future_predictions.append(predicted_scaled_price[0])
+    
+    # 2. 모델이 없으면 학습 구간으로 스케일러를 학습한 뒤 모델과 함께 저장
+    if client is None and model is None:
+        train_frame = feature_frame.iloc[:-days_to_predict]
+        scaler = _fit_scaler(train_frame)
+        X_train, Y_train = create_dataset(scaler.transform(train_frame.values), lookback)
+        # NaN이 섞인 윈도우로 학습하면 손실과 가중치가 NaN이 되고, 증분 학습도 그 모델에서 계속 이어지므로 제외합니다.
+        valid = valid_window_mask(X_train, Y_train)
+        if not valid.any():
+            return "데이터 부족", []
+        X_train, Y_train = X_train[valid], Y_train[valid]
+        model = train_and_save_model(X_train, Y_train, units=config['units'], model_path=model_path, scaler=scaler,
+                                     last_timestamp=train_frame.index[-1], layers=config['layers'],
+                                     dropout=config['dropout'], epochs=config['epochs'], config=config)
+        checkpoint = load_checkpoint(model_path)
+        needs_fine_tune = False
+    elif scaler is None:
+        # 스케일러 없이 저장된 예전 모델: 기존 방식대로 전체 이력으로 학습해 저장해 둡니다.
+        scaler = _fit_scaler(feature_frame)
+        scaler_changed = True
+    
+    # 3. 예전 모델용으로 새로 만든 스케일러 저장
+    # (그 외에는 모델이 학습한 정규화 상태를 그대로 쓰고, 모델을 다시 학습할 때만 함께 갱신합니다.)
+    if scaler_changed:
+        try:
+            scaler.save(scaler_path)
+        except OSError as e:
+            print(f"스케일러 저장 실패: {e}")
+    
+    # 4. 체크포인트에서 이어서 새 봉만 증분 학습 (새 봉을 반영한 스케일러도 모델과 함께 저장)
+    if model is not None and needs_fine_tune:
+        model, scaler = fine_tune_model(model, feature_frame, scaler, checkpoint['last_trained_timestamp'],
+                                        model_path=model_path, lookback=lookback)
+    elif model is not None and checkpoint is None and INCREMENTAL_TRAINING:
+        # 체크포인트 정보 없이 저장된 예전 모델: 지금까지의 봉을 학습된 것으로 보고 이후부터 증분 학습합니다.
+        save_checkpoint(model_path, feature_frame.index[-1], mode='legacy', config=config)
         
-        # 시퀀스 업데이트
-        current_input = np.roll(current_input, -1, axis=0) 
-        current_input[-1, 0] = predicted_scaled_price[0]
+    # 5. 향후 N일 예측 (마지막 lookback개 행만 변환)
+    current_input = scaler.transform(feature_frame.values[-lookback:])
+    if np.isnan(current_input).any():
+        # 최근 lookback개 행에 지표 계산 초반 구간이 포함될 만큼 데이터가 짧은 경우
+        return "데이터 부족", []
+    
+    if client is not None:
+        try:
+            future_predictions = client.forecast(model_path, current_input, days_to_predict)
+        except (OSError, EOFError, RuntimeError) as e:
+            return f"예측 실패 (추론 서버 오류: {e})", []
+    else:
+        future_predictions = forecast_batch(model, current_input[np.newaxis], days_to_predict)[0]
         
-    # 4. 예측 값 역정규화
-    prediction_array = np.zeros((days_to_predict, len(FEATURES)))
-    prediction_array[:, 0] = future_predictions
-    predicted_prices = scaler.inverse_transform(prediction_array)[:, 0]
+    # 6. 예측 값 역정규화 (종가 컬럼만)
+    predicted_prices = scaler.inverse_transform_column(future_predictions, column=0)
     
-    return "✅ 예측 완료", predicted_prices.tolist()
\ No newline at end of file
+    return "✅ 예측 완료", predicted_prices.tolist()
@@ -0,0 +1,120 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# 경로별 지표 이름 (수익률과 MDD는 %, 샤프는 연율화 값)
+RISK_METRICS = ['final_return', 'max_drawdown', 'sharpe']
+
+# 한 청크(프로세스)가 사용할 최대 메모리. 경로 수가 많으면 이 크기에 맞춰 나누어 계산합니다.
+DEFAULT_MAX_MEMORY_MB = 256
+
+# 경로 1개당 길이 T짜리 float64/int64 임시 배열 수 (인덱스, 리샘플 수익률, 누적 로그수익, 자산, 고점, 낙폭 등)
+_ARRAYS_PER_PATH = 8
+
+
+def _block_indices(rng, n_paths, n_obs, block_size):
+    """무작위 시작점에서 block_size개씩 연속으로 이어 붙인 (n_paths, n_obs) 인덱스 행렬을 만듭니다."""
+    n_blocks = math.ceil(n_obs / block_size)
+    starts = rng.integers(0, n_obs - block_size + 1, size=(n_paths, n_blocks))
+    indices = starts[:, :, np.newaxis] + np.arange(block_size)
+    return indices.reshape(n_paths, -1)[:, :n_obs]
+
+
+def _path_metrics(returns, indices, periods_per_year):
+    """리샘플된 경로들의 최종 수익률(%), 최대 낙폭(%), 연율화 샤프 지수를 (n_paths, 3) 배열로 반환합니다."""
+    paths = returns[indices]
+    log_wealth = np.cumsum(np.log1p(paths), axis=1)
+    wealth = np.exp(log_wealth)
+
+    # 초기 자본(1.0)도 고점 후보에 포함합니다.
+    peak = np.maximum(np.maximum.accumulate(wealth, axis=1), 1.0)
+    max_drawdown = (wealth / peak - 1).min(axis=1)
+
+    mean = paths.mean(axis=1)
+    std = paths.std(axis=1, ddof=1)
+    sharpe = np.divide(mean, std, out=np.zeros_like(mean), where=std > 0) * np.sqrt(periods_per_year)
+
+    return np.column_stack([np.expm1(log_wealth[:, -1]) * 100, max_drawdown * 100, sharpe])
+
+
+def _run_chunk(args):
+    """한 청크의 경로를 생성하고 모든 수익률 시계열에 같은 인덱스를 적용해 지표를 계산합니다."""
+    returns, n_paths, block_size, seed_sequence, periods_per_year = args
+    rng = np.random.default_rng(seed_sequence)
+    indices = _block_indices(rng, n_paths, returns.shape[1], block_size)
+    return np.stack([_path_metrics(series, indices, periods_per_year) for series in returns])
+
+
+def _summarize(samples, confidence):
+    alpha = (1 - confidence) / 2
+    lower, median, upper = np.percentile(samples, [alpha * 100, 50, (1 - alpha) * 100], axis=0)
+    return pd.DataFrame({'lower': lower, 'median': median, 'upper': upper, 'mean': samples.mean(axis=0)},
+                        index=RISK_METRICS)
+
+
+def bootstrap_risk(strategy_returns, benchmark_returns=None, n_paths=10000, block_size=20, confidence=0.95,
+                   seed=42, periods_per_year=365, max_memory_mb=DEFAULT_MAX_MEMORY_MB, n_jobs=1):
+    """
+    전략(및 벤치마크) 수익률 시계열을 블록 부트스트랩으로 리샘플링해 지표의 신뢰구간을 계산합니다.
+
+    - block_size개 연속 구간을 이어 붙여 변동성 군집 같은 자기상관을 보존합니다.
+    - 전략과 벤치마크에는 같은 리샘플 인덱스를 사용하므로 경로별 비교(전략 우위 확률)가 가능합니다.
+    - 경로는 max_memory_mb 안에 들어가는 청크 단위로 한 번에 벡터 연산하며, n_jobs > 1이면 여러 프로세스에서 나눠 계산합니다.
+      (최대 메모리 사용량은 대략 n_jobs × max_memory_mb)
+    - 청크마다 seed에서 파생된 독립 난수열을 쓰므로, 같은 seed와 max_memory_mb면 n_jobs와 무관하게 결과가 같습니다.
+    """
+    if isinstance(strategy_returns, pd.Series) and isinstance(benchmark_returns, pd.Series):
+        # 날짜 인덱스가 있으면 두 시계열 모두 값이 있는 날짜만 사용합니다.
+        aligned = pd.concat([strategy_returns, benchmark_returns], axis=1).dropna()
+        series = [aligned.iloc[:, 0].values, aligned.iloc[:, 1].values]
+    else:
+        series = [pd.Series(strategy_returns).dropna().values]
+        if benchmark_returns is not None:
+            series.append(pd.Series(benchmark_returns).dropna().values)
+    n_obs = min(len(s) for s in series)
+    if n_obs < 2:
+        return {'error': "수익률 데이터가 너무 짧아 리샘플링할 수 없습니다."}
+
+    # 길이가 다르면 최근 구간 기준으로 맞춥니다.
+    returns = np.stack([s[-n_obs:] for s in series]).astype(float)
+    block_size = max(1, min(block_size, n_obs))
+
+    # 1. 메모리 한도에 맞춰 청크 크기 결정
+    bytes_per_path = n_obs * 8 * _ARRAYS_PER_PATH * len(series)
+    chunk_size = max(1, min(n_paths, (max_memory_mb * 1024 ** 2) // bytes_per_path))
+    chunk_sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    tasks = [(returns, size, block_size, child, periods_per_year) for size, child in zip(chunk_sizes, seeds)]
+
+    # 2. 청크별 계산 (필요 시 멀티 프로세스)
+    if n_jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            chunks = list(executor.map(_run_chunk, tasks))
+    else:
+        chunks = [_run_chunk(task) for task in tasks]
+    samples = np.concatenate(chunks, axis=1)  # (시계열 수, n_paths, 지표 수)
+
+    # 3. 신뢰구간 요약
+    result = {
+        'strategy': _summarize(samples[0], confidence),
+        'n_paths': n_paths,
+        'block_size': block_size,
+        'confidence': confidence,
+    }
+    if benchmark_returns is not None:
+        result['benchmark'] = _summarize(samples[1], confidence)
+        result['outperformance_prob'] = float((samples[0, :, 0] > samples[1, :, 0]).mean())
+    return result
+
+
+def bootstrap_backtest(backtest_result, **kwargs):
+    """
+    run_sma_backtest 결과의 일일 수익률(전략, 단순 보유)로 bootstrap_risk를 실행합니다.
+    누적 가치 곡선은 첫 값이 NaN이라 pct_change로 복원하면 첫 수익률이 빠지므로, 원래 수익률을 그대로 씁니다.
+    """
+    if 'error' in backtest_result:
+        return backtest_result
+    returns = backtest_result['daily_returns']
+    return bootstrap_risk(returns['Strategy_Returns'], returns['Returns'], **kwargs)
@@ -0,0 +1,197 @@
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+def get_scaler_path(model_path):
+    """모델 파일 옆에 저장되는 정규화 상태 파일 경로를 반환합니다. (예: lstm_model.h5 -> lstm_model_scaler.json)"""
+    base, _ = os.path.splitext(model_path)
+    return f"{base}_scaler.json"
+
+
+class StreamingScaler:
+    """
+    피처별 정규화 상태를 보관하고, 새 봉이 들어올 때마다 점진적으로 갱신하는 스케일러입니다.
+
+    - method='minmax': 지금까지 본 모든 값의 최소/최대를 누적해 feature_range로 변환합니다.
+      (전체 이력으로 fit한 sklearn MinMaxScaler와 동일한 결과)
+    - method='robust': 최근 buffer_size개 행의 중앙값과 IQR로 변환합니다. 이상치(급등/급락)에 덜 민감합니다.
+    """
+
+    def __init__(self, method='minmax', feature_range=(0, 1), buffer_size=5000):
+        if method not in ('minmax', 'robust'):
+            raise ValueError(f"지원하지 않는 정규화 방식입니다: {method}")
+        self.method = method
+        self.feature_range = tuple(feature_range)
+        self.buffer_size = buffer_size
+        self.n_samples_seen = 0
+        self.last_timestamp = None  # 마지막으로 반영한 봉의 시각 (ISO 문자열)
+        self.data_min = None
+        self.data_max = None
+        self.buffer = None
+
+    # --- 1. 상태 갱신 ---
+
+    def partial_fit(self, X, last_timestamp=None):
+        """새로 들어온 행들만으로 정규화 상태를 갱신합니다."""
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(X) == 0:
+            return self
+
+        if self.method == 'minmax':
+            # 지표 계산 초반의 NaN은 무시합니다. (전부 NaN인 컬럼은 경고 없이 NaN 유지)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', category=RuntimeWarning)
+                batch_min = np.nanmin(X, axis=0)
+                batch_max = np.nanmax(X, axis=0)
+            if self.data_min is None:
+                self.data_min, self.data_max = batch_min, batch_max
+            else:
+                self.data_min = np.fmin(self.data_min, batch_min)
+                self.data_max = np.fmax(self.data_max, batch_max)
+        else:
+            buffer = X if self.buffer is None else np.vstack([self.buffer, X])
+            self.buffer = buffer[-self.buffer_size:]
+
+        self.n_samples_seen += len(X)
+        if last_timestamp is not None:
+            self.last_timestamp = pd.Timestamp(last_timestamp).isoformat()
+        return self
+
+    def fit(self, X, last_timestamp=None):
+        """기존 상태를 버리고 X로 새로 학습합니다."""
+        self.n_samples_seen = 0
+        self.last_timestamp = None
+        self.data_min = self.data_max = self.buffer = None
+        return self.partial_fit(X, last_timestamp)
+
+    def update_from_frame(self, frame):
+        """
+        DatetimeIndex를 가진 데이터프레임에서 last_timestamp 이후의 봉만 골라 상태에 반영합니다.
+        반영한 행 수를 반환합니다.
+        """
+        if self.last_timestamp is None:
+            new_rows = frame
+        else:
+            new_rows = frame[frame.index > pd.Timestamp(self.last_timestamp)]
+        if new_rows.empty:
+            return 0
+        self.partial_fit(new_rows.values, new_rows.index[-1])
+        return len(new_rows)
+
+    # --- 2. 변환 ---
+
+    def _center_and_scale(self):
+        """현재 상태로부터 (X - center) / scale 형태의 변환 계수를 계산합니다."""
+        if self.method == 'minmax':
+            if self.data_min is None:
+                raise ValueError("스케일러가 아직 학습되지 않았습니다.")
+            data_range = self.data_max - self.data_min
+            center, scale = self.data_min, data_range
+        else:
+            if self.buffer is None:
+                raise ValueError("스케일러가 아직 학습되지 않았습니다.")
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', category=RuntimeWarning)
+                q25, center, q75 = np.nanpercentile(self.buffer, [25, 50, 75], axis=0)
+            scale = q75 - q25
+
+        # 값의 범위가 0인 컬럼(예: 감성 점수 0.0 고정)은 나눗셈 오류를 막기 위해 1로 둡니다.
+        scale = np.where((scale == 0) | np.isnan(scale), 1.0, scale)
+        center = np.nan_to_num(center)
+        return center, scale
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=float)
+        center, scale = self._center_and_scale()
+        scaled = (X - center) / scale
+        if self.method == 'minmax':
+            low, high = self.feature_range
+            scaled = scaled * (high - low) + low
+        return scaled
+
+    def inverse_transform(self, X):
+        X = np.asarray(X, dtype=float)
+        center, scale = self._center_and_scale()
+        if self.method == 'minmax':
+            low, high = self.feature_range
+            X = (X - low) / (high - low)
+        return X * scale + center
+
+    def inverse_transform_column(self, values, column=0):
+        """단일 컬럼(예: 예측된 종가)만 역변환합니다."""
+        values = np.asarray(values, dtype=float)
+        center, scale = self._center_and_scale()
+        if self.method == 'minmax':
+            low, high = self.feature_range
+            values = (values - low) / (high - low)
+        return values * scale[column] + center[column]
+
+    # --- 3. 저장 / 불러오기 ---
+
+    def to_dict(self):
+        def _to_list(arr):
+            # JSON은 NaN을 표준으로 지원하지 않으므로 None으로 저장합니다.
+            return None if arr is None else np.where(np.isnan(arr), None, arr).tolist()
+
+        return {
+            'method': self.method,
+            'feature_range': list(self.feature_range),
+            'buffer_size': self.buffer_size,
+            'n_samples_seen': self.n_samples_seen,
+            'last_timestamp': self.last_timestamp,
+            'data_min': _to_list(self.data_min),
+            'data_max': _to_list(self.data_max),
+            'buffer': _to_list(self.buffer),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        def _to_array(values):
+            return None if values is None else np.array(values, dtype=float)
+
+        scaler = cls(state['method'], state['feature_range'], state['buffer_size'])
+        scaler.n_samples_seen = state['n_samples_seen']
+        scaler.last_timestamp = state['last_timestamp']
+        scaler.data_min = _to_array(state['data_min'])
+        scaler.data_max = _to_array(state['data_max'])
+        scaler.buffer = _to_array(state['buffer'])
+        return scaler
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 쓰는 도중 다른 세션이 읽어도 깨진 파일을 보지 않도록 임시 파일에 쓴 뒤 교체합니다.
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def load_scaler(path, n_features=None):
+    """저장된 스케일러를 불러옵니다. 파일이 없거나 손상되었거나 피처 수가 다르면 None을 반환합니다."""
+    if not os.path.exists(path):
+        return None
+    try:
+        scaler = StreamingScaler.load(path)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"스케일러 로드 실패 ({e}).")
+        return None
+
+    if n_features is not None:
+        stats = scaler.data_min if scaler.method == 'minmax' else scaler.buffer
+        if stats is None or stats.shape[-1] != n_features:
+            print("저장된 스케일러의 피처 수가 현재 설정과 다릅니다.")
+            return None
+    return scaler
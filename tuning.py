@@ -0,0 +1,229 @@
+"""
+LSTM 하이퍼파라미터 탐색 (Successive Halving)
+
+lookback, units, 층 수, dropout, 피처 조합을 무작위로 뽑은 여러 후보(trial)를 적은 epoch으로 동시에 학습하고,
+검증 손실이 좋은 1/eta만 남겨 epoch을 eta배로 늘려 이어서 학습하는 과정을 반복합니다.
+각 trial은 별도 프로세스에서 threads_per_trial개의 스레드로만 실행되며, 리더보드와 trial 체크포인트가
+모델 저장소(models/<심볼>/tuning)에 저장되므로 중단되어도 이어서 실행할 수 있습니다.
+"""
+import itertools
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from modules.prediction import (FEATURES, MAX_LOOKBACK, _save_model, build_lstm_model, create_dataset,
+                                get_best_config_path, get_model_path, valid_window_mask)
+from modules.scaler import StreamingScaler
+
+# 피처 조합 (첫 컬럼은 예측 대상인 종가여야 합니다)
+FEATURE_SUBSETS = {
+    'all': FEATURES,
+    'price_volume': ['Close', 'Volume'],
+    'trend': ['Close', 'Volume', 'SMA5', 'SMA20', 'MACD', 'MACD_Signal'],
+    'momentum': ['Close', 'Volume', 'RSI', 'Stoch_%K', 'Stoch_%D', 'CCI'],
+    'volatility': ['Close', 'Volume', 'BB_Upper', 'BB_Middle', 'BB_Lower', 'ATR'],
+}
+
+SEARCH_SPACE = {
+    'lookback': [30, 45, MAX_LOOKBACK],  # 코인 상세 화면의 가장 짧은 기간으로도 예측할 수 있는 범위
+    'units': [32, 50, 64],
+    'layers': [1, 2, 3],
+    'dropout': [0.1, 0.2, 0.3],
+    'features': list(FEATURE_SUBSETS),
+}
+
+VALIDATION_RATIO = 0.2       # 검증에 쓰는 마지막 구간 비율
+EARLY_STOPPING_PATIENCE = 2  # rung 안에서 검증 손실이 나아지지 않으면 중단
+
+LEADERBOARD_FILE = 'leaderboard.json'
+
+
+def get_tuning_dir(symbol):
+    return os.path.join(os.path.dirname(get_model_path(symbol)), 'tuning')
+
+
+# --- 1. 후보 생성 및 리더보드 ---
+
+def sample_configs(n_trials, seed=42):
+    """탐색 공간의 모든 조합 중 n_trials개를 중복 없이 무작위로 뽑습니다."""
+    keys = list(SEARCH_SPACE)
+    grid = list(itertools.product(*(SEARCH_SPACE[key] for key in keys)))
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(grid), size=min(n_trials, len(grid)), replace=False)
+    return [dict(zip(keys, grid[i])) for i in picks]
+
+def _save_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _load_leaderboard(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def leaderboard_frame(leaderboard):
+    """리더보드를 trial별 설정과 rung별 검증 손실이 담긴 데이터프레임으로 변환합니다. (손실 오름차순)"""
+    rows = []
+    for trial_id, trial in leaderboard['trials'].items():
+        row = {'trial': trial_id, **trial['config'], 'epochs': trial['epochs_done']}
+        for rung, loss in trial['losses'].items():
+            row[f'rung{rung}_val_loss'] = loss
+        row['val_loss'] = trial['losses'][max(trial['losses'], key=int)] if trial['losses'] else np.nan
+        row['max_rung'] = max(map(int, trial['losses'])) if trial['losses'] else -1
+        rows.append(row)
+    frame = pd.DataFrame(rows)
+    if frame.empty:
+        return frame
+    return frame.sort_values(['max_rung', 'val_loss'], ascending=[False, True]).reset_index(drop=True)
+
+
+# --- 2. trial 실행 (워커 프로세스) ---
+
+def _init_worker(threads_per_trial):
+    """워커 프로세스가 쓸 CPU 스레드 수를 제한합니다. tensorflow 임포트 전에 호출되어야 합니다."""
+    for name in ('OMP_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[name] = str(threads_per_trial)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads_per_trial)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+def _prepare_trial_data(feature_frame, config):
+    """trial 설정의 피처 조합과 lookback으로 학습/검증 윈도우를 만듭니다. 스케일러는 학습 구간으로만 학습합니다."""
+    values = feature_frame[FEATURE_SUBSETS[config['features']]].values
+    split = int(len(values) * (1 - VALIDATION_RATIO))
+
+    scaler = StreamingScaler().fit(values[:split])
+    X, Y = create_dataset(scaler.transform(values), config['lookback'])
+
+    # 지표 계산 초반의 NaN이 포함된 윈도우는 제외합니다.
+    valid = valid_window_mask(X, Y)
+    is_train = np.arange(len(X)) + config['lookback'] < split
+    return (X[valid & is_train], Y[valid & is_train]), (X[valid & ~is_train], Y[valid & ~is_train])
+
+def _run_trial(task):
+    """
+    trial 하나를 target_epochs까지 학습하고 검증 손실을 반환합니다.
+    이전 rung의 체크포인트(옵티마이저 상태 포함)가 있으면 거기서 이어서 학습합니다.
+    """
+    trial_id, config, feature_frame, epochs_done, target_epochs, checkpoint_path = task
+    from tensorflow.keras.callbacks import EarlyStopping
+    from tensorflow.keras.models import load_model
+
+    (X_train, Y_train), (X_val, Y_val) = _prepare_trial_data(feature_frame, config)
+    if len(X_train) == 0 or len(X_val) == 0:
+        return trial_id, float('inf'), target_epochs
+
+    model = None
+    if epochs_done > 0 and os.path.exists(checkpoint_path):
+        try:
+            model = load_model(checkpoint_path)
+        except (OSError, ValueError) as e:
+            # 체크포인트가 손상되었으면 탐색 전체를 멈추지 않고 이 trial만 처음부터 다시 학습합니다.
+            print(f"trial {trial_id} 체크포인트 로드 실패 ({e}). 처음부터 다시 학습합니다.")
+    if model is None:
+        model = build_lstm_model((X_train.shape[1], X_train.shape[2]), config['units'], config['layers'],
+                                 config['dropout'])
+        epochs_done = 0
+
+    early_stopping = EarlyStopping(monitor='val_loss', patience=EARLY_STOPPING_PATIENCE, restore_best_weights=True)
+    model.fit(X_train, Y_train, validation_data=(X_val, Y_val), epochs=target_epochs, initial_epoch=epochs_done,
+              batch_size=32, callbacks=[early_stopping], verbose=0)
+    _save_model(model, checkpoint_path)
+
+    val_loss = float(model.evaluate(X_val, Y_val, verbose=0))
+    return trial_id, val_loss, target_epochs
+
+
+# --- 3. Successive Halving ---
+
+def run_search(data, symbol, n_trials=27, min_epochs=1, eta=3, max_rungs=3, n_workers=None, threads_per_trial=1,
+               seed=42):
+    """
+    기술적 지표(+감성 점수)가 포함된 데이터로 하이퍼파라미터를 탐색하고 최적 설정을 모델 저장소에 저장합니다.
+    저장된 설정은 prediction.get_future_price_prediction이 다음 예측부터 사용합니다. (설정이 바뀌면 모델을 새로 학습)
+
+    rung r에서는 살아남은 trial을 min_epochs × eta^r epoch까지 학습한 뒤 상위 1/eta만 다음 rung으로 보냅니다.
+    n_workers개 trial이 동시에 실행되며(기본값: CPU 코어 수 / threads_per_trial), 같은 심볼로 다시 호출하면
+    저장된 리더보드에서 이어서 진행합니다. 반환값: (최적 설정, 리더보드 데이터프레임)
+    """
+    tuning_dir = get_tuning_dir(symbol)
+    os.makedirs(tuning_dir, exist_ok=True)
+    leaderboard_path = os.path.join(tuning_dir, LEADERBOARD_FILE)
+    n_workers = n_workers or max(1, (os.cpu_count() or 1) // threads_per_trial)
+
+    # 1. 리더보드 불러오기 (없으면 새 후보 생성)
+    leaderboard = _load_leaderboard(leaderboard_path)
+    if leaderboard is None:
+        leaderboard = {
+            'symbol': symbol,
+            'eta': eta,
+            'min_epochs': min_epochs,
+            'max_rungs': max_rungs,
+            'trials': {
+                f"{i:03d}": {'config': config, 'epochs_done': 0, 'losses': {}}
+                for i, config in enumerate(sample_configs(n_trials, seed))
+            },
+        }
+        _save_json(leaderboard_path, leaderboard)
+    # 이어서 실행할 때는 저장된 halving 일정을 그대로 사용합니다. (인자로 다른 값을 줘도 무시)
+    saved_schedule = (leaderboard['eta'], leaderboard['min_epochs'], leaderboard.setdefault('max_rungs', max_rungs))
+    if saved_schedule != (eta, min_epochs, max_rungs):
+        print(f"저장된 리더보드의 탐색 일정(eta, min_epochs, max_rungs)={saved_schedule}으로 이어서 진행합니다.")
+    eta, min_epochs, max_rungs = saved_schedule
+    trials = leaderboard['trials']
+
+    feature_frame = data[FEATURES]
+    survivors = list(trials)
+
+    # tensorflow는 fork 후 안전하지 않으므로 spawn 방식으로 워커를 띄웁니다.
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=context, initializer=_init_worker,
+                             initargs=(threads_per_trial,)) as executor:
+        for rung in range(max_rungs):
+            target_epochs = min_epochs * eta ** rung
+            pending = [trial_id for trial_id in survivors if str(rung) not in trials[trial_id]['losses']]
+
+            # 2. 이번 rung에서 아직 평가되지 않은 trial만 동시에 실행
+            futures = [
+                executor.submit(_run_trial, (
+                    trial_id, trials[trial_id]['config'], feature_frame, trials[trial_id]['epochs_done'],
+                    target_epochs, os.path.join(tuning_dir, f"trial_{trial_id}.h5"),
+                ))
+                for trial_id in pending
+            ]
+            for future in as_completed(futures):
+                trial_id, val_loss, epochs_done = future.result()
+                trials[trial_id]['losses'][str(rung)] = val_loss
+                trials[trial_id]['epochs_done'] = epochs_done
+                # trial이 끝날 때마다 저장해 중단되어도 이어서 실행할 수 있게 합니다.
+                _save_json(leaderboard_path, leaderboard)
+
+            # 3. 상위 1/eta만 다음 rung으로
+            survivors.sort(key=lambda trial_id: trials[trial_id]['losses'][str(rung)])
+            if rung < max_rungs - 1:
+                survivors = survivors[:max(1, len(survivors) // eta)]
+
+    # 4. 최적 설정을 모델 저장소에 저장
+    best_id = survivors[0]
+    best = {
+        **trials[best_id]['config'],
+        'feature_columns': FEATURE_SUBSETS[trials[best_id]['config']['features']],
+        'epochs': trials[best_id]['epochs_done'],
+        'val_loss': trials[best_id]['losses'][max(trials[best_id]['losses'], key=int)],
+        'trial': best_id,
+    }
+    # 예측 세션이 읽는 중에 깨진 파일을 보지 않도록 리더보드와 같이 교체 방식으로 저장합니다.
+    _save_json(get_best_config_path(symbol), best)
+    print(f"최적 설정 저장 완료: {get_best_config_path(symbol)}")
+
+    return best, leaderboard_frame(leaderboard)
@@ -1,3 +1,6 @@
+import html
+
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
@@ -98,4 +101,48 @@ def get_candlestick_chart(data, coin_name):
     fig.update_yaxes(title_text="MACD", row=2, col=1)
     fig.update_yaxes(title_text="RSI", row=3, col=1, range=[0, 100]) # RSI는 0~100 고정
 
-    return fig
\ No newline at end of file
+    return fig
+
+
+# --- 개요 화면용 스파크라인 ---
+
+def render_sparkline_svg(points, width=160, height=40, color='lightgreen'):
+    """다운샘플된 종가로 작은 SVG 선 그래프 문자열을 만듭니다. Plotly 차트보다 훨씬 가볍습니다."""
+    points = np.asarray(points, dtype=float)
+    if len(points) < 2:
+        return ''
+
+    padding = 2
+    low, high = points.min(), points.max()
+    value_range = high - low if high > low else 1.0
+    xs = np.linspace(padding, width - padding, len(points))
+    ys = height - padding - (points - low) / value_range * (height - 2 * padding)
+    coords = ' '.join(f"{x:.1f},{y:.1f}" for x, y in zip(xs, ys))
+
+    return (f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg">'
+            f'<polyline fill="none" stroke="{color}" stroke-width="2" points="{coords}"/></svg>')
+
+def render_sparkline_grid(cards):
+    """
+    코인별 카드(name, price, change, svg)를 하나의 HTML 그리드로 합칩니다.
+    코인 수가 늘어나도 차트 요소를 따로 보내지 않고 한 번에 렌더링합니다.
+    """
+    empty_chart = '<div style="font-size:0.8rem;opacity:0.6;">차트 데이터 없음</div>'
+    items = []
+    for card in cards:
+        change = card.get('change')
+        change_html = ''
+        if change is not None:
+            change_color = 'lightgreen' if change >= 0 else 'tomato'
+            change_html = f'<div style="color:{change_color};font-size:0.8rem;">{change:+.2f}%</div>'
+        items.append(
+            '<div style="padding:0.5rem;">'
+            f'<div style="font-size:0.85rem;opacity:0.8;">{html.escape(card["name"])}</div>'
+            # st.markdown이 '$...$'를 수식으로 해석하지 않도록 달러 기호를 HTML 엔티티로 바꿉니다.
+            f'<div style="font-size:1.4rem;font-weight:600;">{html.escape(card["price"]).replace("$", "&#36;")}</div>'
+            f'{change_html}'
+            f'{card["svg"] or empty_chart}'
+            '</div>'
+        )
+    return ('<div style="display:grid;grid-template-columns:repeat(auto-fill,minmax(170px,1fr));gap:0.5rem;">'
+            + ''.join(items) + '</div>')